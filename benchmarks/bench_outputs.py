@@ -0,0 +1,99 @@
+"""
+Write-throughput benchmark for the result output formats
+
+Synthesizes classification results (random resolutions and file sizes, built
+through the classifier's RecordStore so dtypes match real runs) and writes them
+in batches with every output format in outputs.py. Reports rows/sec, output
+size and bytes per row, and writes the measurements to a JSON file.
+
+Usage: python benchmarks/bench_outputs.py [--rows N] [--batch-size N] [--repeat N]
+                                          [--output bench_outputs.json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from bench_pipeline import environment, measure  # also puts tasks/ on sys.path
+
+from classify import ImageClassifier  # noqa: E402
+from outputs import open_result_writer, output_extension  # noqa: E402
+
+# (format, ndjson compression) combinations to benchmark
+VARIANTS = [
+    ('csv', None),
+    ('parquet', None),
+    ('arrow', None),
+    ('ndjson', 'gzip'),
+    ('ndjson', 'zstd'),
+    ('ndjson', None),
+]
+
+
+def synthesize_batches(rows: int, batch_size: int, seed: int = 0) -> List[pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    classifier = ImageClassifier()
+    sizes = list(classifier.resolution_categories.values())
+
+    batches = []
+    for start in range(0, rows, batch_size):
+        count = min(batch_size, rows - start)
+        store = classifier.new_record_store()
+        picks = rng.integers(0, len(sizes), count)
+        file_sizes = rng.integers(20_000, 20_000_000, count)
+        for offset in range(count):
+            width, height = sizes[picks[offset]]
+            store.append(f'archive/2024/{start + offset:09d}.jpg', width, height, int(file_sizes[offset]))
+        batches.append(store.to_frame())
+    return batches
+
+
+def write_all(batches: List[pd.DataFrame], path: str, output_format: str, compression) -> None:
+    with open_result_writer(path, output_format, compression) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000, help="Result rows to write")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Rows per written batch")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per format")
+    parser.add_argument('--output', default='bench_outputs.json', help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    batches = synthesize_batches(args.rows, args.batch_size)
+    results = {
+        'environment': environment(),
+        'rows': args.rows,
+        'batch_size': args.batch_size,
+        'formats': {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix='bench_outputs_') as work_dir:
+        for output_format, compression in VARIANTS:
+            name = output_format + (f'+{compression}' if compression else '')
+            path = os.path.join(work_dir, 'results' + output_extension(output_format, compression))
+            timing = measure(lambda: write_all(batches, path, output_format, compression), args.repeat, args.rows)
+            file_bytes = os.path.getsize(path)
+            timing.update({
+                'file_bytes': file_bytes,
+                'bytes_per_row': round(file_bytes / args.rows, 1),
+                'mb_per_second': round(file_bytes / timing['best_seconds'] / (1024 * 1024), 1),
+            })
+            results['formats'][name] = timing
+            print(f"{name:14} {timing['items_per_second']:12.0f} rows/sec "
+                  f"{file_bytes / (1024 * 1024):9.1f} MB {timing['bytes_per_row']:7.1f} bytes/row")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
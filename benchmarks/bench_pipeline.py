@@ -0,0 +1,279 @@
+"""
+End-to-end benchmark suite for the classification pipeline
+
+Generates a synthetic corpus (see corpus.py) and times:
+  - ImageClassifier.get_image_resolution for every probe engine
+  - ImageClassifier.process_images for every executor
+  - ImageClassifier.generate_statistics on a replicated results frame
+  - classify_images_task end to end, writing a CSV
+  - the DAG callables (extract, mapped transforms, load) with a fake Airflow context
+
+Every measurement is repeated and its best and median wall time are written,
+with environment details, to a JSON file so runs can be compared across releases.
+
+Usage: python benchmarks/bench_pipeline.py [--images-per-variant N] [--formats jpeg,png]
+                                           [--repeat N] [--output bench.json]
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+from corpus import FORMATS, build_corpus, category_resolutions  # also puts tasks/ on sys.path
+
+from classify import ImageClassifier, classify_images_task  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DAG_PATH = os.path.join(REPO_ROOT, 'dags', 'image_classification_dag.py')
+
+
+def measure(func: Callable[[], Any], repeat: int, items: int) -> Dict:
+    """Run func repeat times and summarize wall times; items is the work done per run"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings, items)
+
+
+def summarize(timings: List[float], items: int) -> Dict:
+    best = min(timings)
+    return {
+        'runs': len(timings),
+        'items': items,
+        'best_seconds': round(best, 6),
+        'median_seconds': round(statistics.median(timings), 6),
+        'items_per_second': round(items / best, 1) if best > 0 else None,
+    }
+
+
+def bench_get_image_resolution(paths: List[str], repeat: int) -> Dict:
+    results = {}
+    for engine in ImageClassifier.PROBE_ENGINES:
+        classifier = ImageClassifier(probe_engine=engine)
+        results[engine] = measure(lambda: [classifier.get_image_resolution(p) for p in paths],
+                                  repeat, len(paths))
+    return results
+
+
+def bench_process_images(folder: str, image_count: int, repeat: int) -> Dict:
+    results = {}
+    for executor in ImageClassifier.EXECUTORS:
+        classifier = ImageClassifier(executor=executor)
+        results[executor] = measure(lambda: classifier.process_images(folder), repeat, image_count)
+    return results
+
+
+def bench_generate_statistics(folder: str, rows: int, repeat: int) -> Dict:
+    classifier = ImageClassifier()
+    df = classifier.process_images(folder)
+    df = pd.concat([df] * (rows // len(df) + 1), ignore_index=True).head(rows)
+    return measure(lambda: classifier.generate_statistics(df), repeat, len(df))
+
+
+def bench_classify_images_task(folder: str, work_dir: str, image_count: int, repeat: int) -> Dict:
+    output_file = os.path.join(work_dir, 'classify_task.csv')
+    return measure(
+        lambda: classify_images_task(folder, output_file, return_results=False),
+        repeat, image_count
+    )
+
+
+def _install_airflow_stubs() -> None:
+    """Register minimal airflow modules so the DAG file imports without Airflow installed"""
+
+    class Operator:
+        def __init__(self, *args, **kwargs):
+            self.output = None
+
+        @classmethod
+        def partial(cls, *args, **kwargs):
+            return cls()
+
+        def expand(self, *args, **kwargs):
+            return self
+
+        def __rshift__(self, other):
+            return other
+
+    modules = {name: types.ModuleType(name) for name in (
+        'airflow', 'airflow.operators', 'airflow.operators.python',
+        'airflow.operators.empty', 'airflow.utils', 'airflow.utils.task_group'
+    )}
+    modules['airflow'].DAG = lambda *args, **kwargs: None
+    modules['airflow.operators.python'].PythonOperator = Operator
+    modules['airflow.operators.empty'].EmptyOperator = Operator
+    modules['airflow.utils.task_group'].TaskGroup = object
+    sys.modules.update(modules)
+
+
+def load_dag_module() -> types.ModuleType:
+    try:
+        import airflow  # noqa: F401
+    except ImportError:
+        _install_airflow_stubs()
+
+    spec = importlib.util.spec_from_file_location('image_classification_dag', DAG_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeTaskInstance:
+    """Task instance with an in-memory XCom store shared by every task of a fake run"""
+
+    def __init__(self, task_id: str, xcoms: Dict, map_index: int = -1):
+        self.task_id = task_id
+        self.map_index = map_index
+        self._xcoms = xcoms
+
+    def xcom_push(self, key: str, value: Any) -> None:
+        self._xcoms[(self.task_id, key)] = value
+
+    def xcom_pull(self, task_ids: str = None, key: str = 'return_value', **kwargs) -> Any:
+        return self._xcoms.get((task_ids, key))
+
+
+class FakeDagRun:
+    def __init__(self, conf: Dict, run_id: str):
+        self.conf = conf
+        self.run_id = run_id
+
+
+def run_dag(dag_module: types.ModuleType, conf: Dict, run_id: str, timings: Dict) -> Dict:
+    """Run extract, every mapped transform and load in order, adding each stage's time to timings"""
+    xcoms = {}
+    dag_run = FakeDagRun(conf, run_id)
+
+    def context(task_id: str, map_index: int = -1) -> Dict:
+        task_instance = FakeTaskInstance(task_id, xcoms, map_index)
+        return {'dag_run': dag_run, 'task_instance': task_instance, 'ti': task_instance,
+                'ds': datetime.now().strftime('%Y-%m-%d')}
+
+    start = time.perf_counter()
+    slices = dag_module.extract_images(**context('extract_images'))
+    transform_start = time.perf_counter()
+    xcoms[('transform_classify_image', 'return_value')] = [
+        dag_module.transform_classify_image(image_slice, **context('transform_classify_image', index))
+        for index, image_slice in enumerate(slices)
+    ]
+    load_start = time.perf_counter()
+    result = dag_module.load_aggregate_results(**context('load_aggregate_results'))
+    end = time.perf_counter()
+
+    timings['extract_images'].append(transform_start - start)
+    timings['transform_classify_image'].append(load_start - transform_start)
+    timings['load_aggregate_results'].append(end - load_start)
+    timings['total'].append(end - start)
+    return result
+
+
+def bench_dag(folder: str, work_dir: str, image_count: int, chunk_size: int, repeat: int) -> Dict:
+    dag_module = load_dag_module()
+    conf = {
+        'input_folder': folder,
+        'output_folder': os.path.join(work_dir, 'dag_output'),
+        'chunk_size': chunk_size,
+        'cache_path': None,
+        'results_dir': os.path.join(work_dir, 'dag_results'),
+        'manifest_dir': os.path.join(work_dir, 'dag_manifests'),
+    }
+
+    timings = {stage: [] for stage in ('extract_images', 'transform_classify_image',
+                                       'load_aggregate_results', 'total')}
+    for run in range(repeat):
+        result = run_dag(dag_module, conf, f'bench__{run}', timings)
+        if result['statistics']['successful_classifications'] != image_count:
+            raise SystemExit(f"DAG run classified {result['statistics']['successful_classifications']} "
+                             f"of {image_count} images")
+
+    summary = {'chunk_size': chunk_size}
+    for stage, stage_timings in timings.items():
+        summary[stage] = summarize(stage_timings, image_count)
+    return summary
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images-per-variant', type=int, default=4,
+                        help="Images per format variant and resolution category")
+    parser.add_argument('--formats', default=','.join(FORMATS), help="Comma-separated formats to generate")
+    parser.add_argument('--plain-only', action='store_true', help="Skip the harder format variants")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement")
+    parser.add_argument('--stats-rows', type=int, default=100000,
+                        help="Rows in the frame given to generate_statistics")
+    parser.add_argument('--chunk-size', type=int, default=50, help="Images per mapped transform in the DAG run")
+    parser.add_argument('--output', default='benchmark_results.json', help="Path of the JSON results file")
+    args = parser.parse_args()
+
+    formats = [name.strip() for name in args.formats.split(',') if name.strip()]
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as work_dir:
+        folder = os.path.join(work_dir, 'input')
+        paths = build_corpus(folder, args.images_per_variant, formats, all_variants=not args.plain_only)
+        image_count = len(paths)
+
+        results = {
+            'environment': environment(),
+            'corpus': {
+                'images': image_count,
+                'total_bytes': sum(os.path.getsize(path) for path in paths),
+                'formats': formats,
+                'all_variants': not args.plain_only,
+                'resolutions': [f'{width}x{height}' for width, height in category_resolutions()],
+                'images_per_variant': args.images_per_variant,
+            },
+            'benchmarks': {
+                'get_image_resolution': bench_get_image_resolution(paths, args.repeat),
+                'process_images': bench_process_images(folder, image_count, args.repeat),
+                'generate_statistics': bench_generate_statistics(folder, args.stats_rows, args.repeat),
+                'classify_images_task': bench_classify_images_task(folder, work_dir, image_count, args.repeat),
+                'dag': bench_dag(folder, work_dir, image_count, args.chunk_size, args.repeat),
+            },
+        }
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for name, result in results['benchmarks'].items():
+        for label, timing in (result.items() if 'runs' not in result else [('', result)]):
+            if isinstance(timing, dict):
+                print(f"{name:22} {label:26} {timing['best_seconds']:10.4f}s "
+                      f"{timing['items_per_second'] or 0:12.0f} items/sec")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark header-only dimension probing against the PIL path
+
+Generates a mixed corpus (JPEG, progressive JPEG with a large EXIF block, PNG,
+BMP, TIFF, lossy/lossless/extended WebP) in a temporary folder, checks that both
+probe engines agree on every file and reports images/sec for each engine.
+
+Usage: python benchmarks/bench_probe.py [--images-per-variant N] [--repeat N]
+"""
+
+import argparse
+import tempfile
+import time
+
+from corpus import build_corpus  # also puts tasks/ on sys.path
+
+from classify import ImageClassifier  # noqa: E402
+
+
+def run_engine(classifier: ImageClassifier, paths: list, repeat: int) -> tuple:
+    sizes = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            sizes[path] = classifier.get_image_resolution(path)
+    elapsed = time.perf_counter() - start
+    return sizes, len(paths) * repeat / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images-per-variant', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_probe_') as folder:
+        paths = build_corpus(folder, args.images_per_variant)
+
+        pil_sizes, pil_rate = run_engine(ImageClassifier(probe_engine='pil'), paths, args.repeat)
+        header_sizes, header_rate = run_engine(ImageClassifier(probe_engine='header'), paths, args.repeat)
+
+    mismatches = [path for path in paths if pil_sizes[path] != header_sizes[path]]
+    if mismatches:
+        raise SystemExit(f"Probe engines disagree on {len(mismatches)} files: {mismatches[:5]}")
+
+    print(f"Corpus: {len(paths)} images, {args.repeat} passes")
+    print(f"pil:    {pil_rate:10.0f} images/sec")
+    print(f"header: {header_rate:10.0f} images/sec ({header_rate / pil_rate:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
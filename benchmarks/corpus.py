@@ -0,0 +1,75 @@
+"""
+Synthetic image corpora for benchmarks
+
+Images are generated offline with PIL in every format the pipeline scans
+(JPEG, PNG, TIFF, WebP, BMP) at one resolution per classifier category. Each
+format can also be saved in its harder variants (progressive JPEG with a large
+EXIF block, lossless and extended WebP) to exercise the header probes.
+"""
+
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tasks'))
+
+from classify import ImageClassifier  # noqa: E402
+
+FORMATS = ('jpeg', 'png', 'tiff', 'webp', 'bmp')
+
+
+def _large_exif() -> bytes:
+    exif = Image.Exif()
+    exif[0x010E] = 'x' * 60000  # ImageDescription, pushes SOF well past the head block
+    return exif.tobytes()
+
+
+# (file suffix, PIL save options, image mode); the first variant of each format is the plain one
+FORMAT_VARIANTS: Dict[str, List[Tuple[str, Dict, str]]] = {
+    'jpeg': [
+        ('.jpg', {'format': 'JPEG', 'quality': 85}, 'RGB'),
+        ('_exif.jpeg', {'format': 'JPEG', 'progressive': True, 'exif': _large_exif()}, 'RGB'),
+    ],
+    'png': [('.png', {'format': 'PNG', 'compress_level': 1}, 'RGB')],
+    'tiff': [('.tiff', {'format': 'TIFF'}, 'RGB')],
+    'webp': [
+        ('_lossy.webp', {'format': 'WEBP', 'quality': 80}, 'RGB'),
+        ('_lossless.webp', {'format': 'WEBP', 'lossless': True}, 'RGB'),
+        # Translucent alpha forces the extended VP8X layout
+        ('_alpha.webp', {'format': 'WEBP', 'quality': 80}, 'RGBA'),
+    ],
+    'bmp': [('.bmp', {'format': 'BMP'}, 'RGB')],
+}
+
+
+def category_resolutions() -> List[Tuple[int, int]]:
+    """One (width, height) per resolution category of the classifier, smallest first"""
+    return sorted(ImageClassifier().resolution_categories.values(), key=lambda size: size[0] * size[1])
+
+
+def build_corpus(folder: str, images_per_variant: int = 4, formats: Iterable[str] = FORMATS,
+                 resolutions: Optional[List[Tuple[int, int]]] = None,
+                 all_variants: bool = True) -> List[str]:
+    """
+    Generate images_per_variant images per format variant and resolution in folder
+
+    Returns the sorted paths of the generated files.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+
+    for width, height in resolutions or category_resolutions():
+        for index in range(images_per_variant):
+            image = Image.new('RGB', (width, height), (index * 37 % 256, 80, 160))
+            rgba = image.convert('RGBA')
+            rgba.putalpha(128)
+            for image_format in formats:
+                variants = FORMAT_VARIANTS[image_format]
+                for suffix, options, mode in (variants if all_variants else variants[:1]):
+                    path = os.path.join(folder, f'img_{width}x{height}_{index}{suffix}')
+                    (rgba if mode == 'RGBA' else image).save(path, **options)
+                    paths.append(path)
+
+    return sorted(paths)
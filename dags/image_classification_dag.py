@@ -6,15 +6,16 @@ This DAG implements a 3-task ETL pipeline for image classification:
 2. Transform: Classify images based on resolution using dynamic task mapping
 3. Load: Aggregate results and save to output location
 
+followed by a cleanup task removing the run's intermediate files.
+
 Author: ML Ops Team
 """
 
 from datetime import datetime, timedelta
 import os
-import json
 import logging
 import sys
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 # Airflow imports with type ignore
 try:
@@ -50,11 +51,23 @@ except ImportError:
 # Import our custom classification module
 sys.path.append("/opt/airflow/tasks")
 try:
-    from classify import classify_images_task  # type: ignore
+    from classify import ImageClassifier  # type: ignore
 except ImportError:
-    # Mock function for local development
-    def classify_images_task(*args, **kwargs):
-        return {"status": "error", "message": "Mock function"}
+    # Mock class for local development
+    class ImageClassifier:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def classify_file(self, *args, **kwargs):
+            return None
+
+        def classify_paths(self, image_paths):
+            import pandas as pd
+
+            return pd.DataFrame(), []
+
+        def classify_resolutions(self, widths, heights):
+            return [None] * len(widths)
 
 
 # Default arguments for the DAG
@@ -68,6 +81,24 @@ default_args = {
     "retry_delay": timedelta(minutes=5),
 }
 
+# Number of images classified by each mapped transform task unless overridden
+# through dag_run.conf["chunk_size"]
+DEFAULT_CHUNK_SIZE = 500
+
+# Persistent classification cache shared by all runs; set dag_run.conf["cache_path"]
+# to null to disable it
+DEFAULT_CACHE_PATH = "/opt/airflow/data/cache/classification_cache.sqlite"
+
+# Scan watermark used by incremental runs (dag_run.conf["incremental"])
+DEFAULT_STATE_PATH = "/opt/airflow/data/state/scan_watermark.json.gz"
+
+# Shared folder where transform tasks hand their results to the load step
+# (dag_run.conf["result_handoff"] = "file", the default)
+DEFAULT_RESULTS_DIR = "/opt/airflow/data/results"
+
+# Folder for per-run extract manifests (dag_run.conf["manifest_dir"])
+DEFAULT_MANIFEST_DIR = "/opt/airflow/data/manifests"
+
 # DAG definition
 dag = DAG(
     "image_classification_etl",
@@ -80,16 +111,64 @@ dag = DAG(
 )
 
 
+def _chunk_images(
+    image_files: List[Dict[str, Any]],
+    chunk_size: int,
+    chunk_max_bytes: Optional[int] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Group image metadata into chunks bounded by image count and/or total bytes
+
+    An image larger than chunk_max_bytes still gets a chunk of its own.
+    """
+    chunks = []
+    current_chunk = []
+    current_bytes = 0
+
+    for image_data in image_files:
+        over_count = chunk_size and len(current_chunk) >= chunk_size
+        over_bytes = (
+            chunk_max_bytes
+            and current_chunk
+            and current_bytes + image_data["file_size"] > chunk_max_bytes
+        )
+        if over_count or over_bytes:
+            chunks.append(current_chunk)
+            current_chunk = []
+            current_bytes = 0
+
+        current_chunk.append(image_data)
+        current_bytes += image_data["file_size"]
+
+    if current_chunk:
+        chunks.append(current_chunk)
+
+    return chunks
+
+
 def extract_images(**context) -> List[Dict[str, Any]]:
     """
-    Task 1: Extract - Scan input folder and prepare image list for processing
+    Task 1: Extract - Scan input folder and prepare image chunks for processing
+
+    Chunking is controlled through dag_run.conf:
+        chunk_size: Maximum number of images per mapped transform task
+        chunk_max_bytes: Maximum total file size per mapped transform task
+
+    The scan itself can be narrowed through dag_run.conf (recursive, include,
+    exclude, min_size, max_size). With dag_run.conf["incremental"] set, only
+    images that are new or changed since the last committed scan watermark are
+    emitted.
+
+    The image list itself is written to a manifest file under
+    dag_run.conf["manifest_dir"]; only slice descriptors go through XCom.
 
     Returns:
-        List of dictionaries containing image metadata
+        List of manifest slice descriptors, one per chunk of images
     """
-    input_folder = context["dag_run"].conf.get(
-        "input_folder", "/opt/airflow/data/input"
-    )
+    conf = context["dag_run"].conf
+    input_folder = conf.get("input_folder", "/opt/airflow/data/input")
+    chunk_size = int(conf.get("chunk_size", DEFAULT_CHUNK_SIZE))
+    chunk_max_bytes = conf.get("chunk_max_bytes")
 
     logging.info(f"Scanning input folder: {input_folder}")
 
@@ -97,91 +176,314 @@ def extract_images(**context) -> List[Dict[str, Any]]:
         logging.error(f"Input folder {input_folder} does not exist")
         return []
 
-    # Get all image files
-    image_extensions = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".webp"}
+    from scanner import scan_images  # type: ignore
+
+    # Get all image files in one pass, reusing each directory entry's stat
+    incremental = bool(conf.get("incremental"))
     image_files = []
+    snapshot = {}
+
+    for entry in scan_images(
+        input_folder,
+        recursive=bool(conf.get("recursive")),
+        include=conf.get("include"),
+        exclude=conf.get("exclude"),
+        min_size=conf.get("min_size"),
+        max_size=conf.get("max_size"),
+    ):
+        if incremental:
+            snapshot[entry.path] = (entry.size, entry.mtime_ns)
+        image_files.append(
+            {
+                "filename": entry.name,
+                "file_path": entry.path,
+                "file_size": entry.size,
+            }
+        )
+
+    logging.info(f"Found {len(image_files)} images")
+
+    if incremental:
+        from manifest import ScanWatermark, changed_files  # type: ignore
+
+        watermark = ScanWatermark(conf.get("state_path", DEFAULT_STATE_PATH))
+        previous = watermark.load()
+        changed = changed_files(snapshot, previous)
+        image_files = [f for f in image_files if f["file_path"] in changed]
 
-    for file in os.listdir(input_folder):
-        if any(file.lower().endswith(ext) for ext in image_extensions):
-            file_path = os.path.join(input_folder, file)
-            file_size = os.path.getsize(file_path)
-
-            image_files.append(
-                {
-                    "filename": file,
-                    "file_path": file_path,
-                    "file_size": file_size,
-                    "batch_id": context["dag_run"].run_id,
-                }
+        if not image_files:
+            # Nothing to transform, so no load step will run to promote a pending
+            # snapshot; record deletions now and leave no pending file behind
+            if len(snapshot) != len(previous):
+                watermark.save(snapshot)
+        else:
+            # The load step promotes this snapshot once the run's results are saved
+            pending_path = watermark.write_pending(snapshot, context["dag_run"].run_id)
+            context["task_instance"].xcom_push(
+                key="watermark_pending", value=pending_path
             )
 
-    logging.info(f"Found {len(image_files)} images to process")
+    logging.info(f"{len(image_files)} images to process")
+
+    chunks = _chunk_images(
+        image_files,
+        chunk_size,
+        int(chunk_max_bytes) if chunk_max_bytes else None,
+    )
+    logging.info(f"Split images into {len(chunks)} chunks")
+
+    # Lets the load step tell which mapped transform results are missing
+    context["task_instance"].xcom_push(key="chunk_count", value=len(chunks))
 
-    # Store the image list in XCom for the next task
-    context["task_instance"].xcom_push(key="image_list", value=image_files)
+    if not chunks:
+        return []
+
+    from handoff import run_results_dir  # type: ignore
+    from manifest import write_image_manifest  # type: ignore
+
+    # Store the image list in a manifest file; XCom only carries its slices
+    manifest_path = (
+        run_results_dir(
+            conf.get("manifest_dir", DEFAULT_MANIFEST_DIR),
+            context["dag_run"].run_id,
+        )
+        + ".arrow"
+    )
+    slices = write_image_manifest(chunks, manifest_path)
+    context["task_instance"].xcom_push(
+        key="manifest", value={"path": manifest_path, "rows": len(image_files)}
+    )
+    logging.info(f"Image manifest written to {manifest_path}")
 
-    return image_files
+    return slices
 
 
-def transform_classify_image(image_data: Dict[str, Any], **context) -> Dict[str, Any]:
+def transform_classify_image(image_slice: Dict[str, Any], **context) -> Dict[str, Any]:
     """
-    Task 2: Transform - Classify individual image (used with dynamic task mapping)
+    Task 2: Transform - Classify a chunk of images (used with dynamic task mapping)
 
     Args:
-        image_data: Dictionary containing image metadata
+        image_slice: Manifest slice descriptor locating this task's chunk of images
 
     Returns:
-        Dictionary containing classification results
+        Dictionary with the chunk's mergeable RunningStatistics state and its
+        results: with the default "file" result handoff, successful results are
+        written to an Arrow part file and only its path is returned, otherwise
+        every result is returned inline
     """
-    logging.info(f"Processing image: {image_data['filename']}")
+    from cache import ClassificationCache  # type: ignore
+    from manifest import read_manifest_slice  # type: ignore
+    from progress import DEFAULT_EVERY_SECONDS, ProgressLogger  # type: ignore
+    from stats import RunningStatistics  # type: ignore
+
+    conf = context["dag_run"].conf
+    batch_id = context["dag_run"].run_id
+    image_batch = read_manifest_slice(image_slice)
+    logging.info(f"Processing chunk of {len(image_batch)} images")
+
+    cache_path = conf.get("cache_path", DEFAULT_CACHE_PATH)
+    cache = (
+        ClassificationCache(
+            cache_path, hash_content=bool(conf.get("cache_hash_content"))
+        )
+        if cache_path
+        else None
+    )
+    # Per-image results are logged at DEBUG; progress is aggregated at INFO
+    progress = ProgressLogger(
+        every_seconds=conf.get("log_every_seconds", DEFAULT_EVERY_SECONDS),
+        every_images=conf.get("log_every_images"),
+        label=f"Chunk {context['task_instance'].map_index}",
+    )
+    probe_budget = conf.get("probe_budget")
+    if probe_budget:
+        # Metered storage: cap the bytes read per image and record them
+        classifier = ImageClassifier(
+            probe_engine="budget",
+            probe_budget=int(probe_budget),
+            cache=cache,
+            progress=progress,
+        )
+    else:
+        classifier = ImageClassifier(cache=cache, progress=progress)
+    stats = RunningStatistics(quantiles=bool(conf.get("quantiles")))
+
+    # Classify the whole chunk in place with one call: one cache window and
+    # commit, and vectorized classification into the columnar record store
+    paths = [image_data["file_path"] for image_data in image_batch]
+    filenames = {image_data["file_path"]: image_data["filename"] for image_data in image_batch}
+    results_df, failures = classifier.classify_paths(paths)
+
+    failed_paths = {path for path, _ in failures}
+    if not results_df.empty:
+        # Results keep the input order, minus the failed images. Name them by
+        # the manifest's filename, the path relative to input_folder, as the
+        # failure records are, so recursive scans keep sub1/a.jpg and sub2/a.jpg apart
+        classified = [
+            image_data
+            for image_data in image_batch
+            if image_data["file_path"] not in failed_paths
+        ]
+        results_df["filename"] = [image_data["filename"] for image_data in classified]
+        results_df["batch_id"] = batch_id
+        results_df["original_file_path"] = [
+            image_data["file_path"] for image_data in classified
+        ]
+        stats.update_frame(results_df)
+
+    failed = []
+    for path, error_type in failures:
+        logging.error("Failed to classify %s (%s)", filenames[path], error_type)
+        failed.append(
+            {
+                "filename": filenames[path],
+                "status": "error",
+                "error_type": error_type,
+                "error_message": "Classification failed",
+                "batch_id": batch_id,
+                "original_file_path": path,
+            }
+        )
 
-    # Create a temporary folder for single image processing
-    temp_folder = f"/tmp/airflow_temp_{context['task_instance'].task_id}"
-    os.makedirs(temp_folder, exist_ok=True)
+    if conf.get("result_handoff", "file") == "file":
+        from handoff import run_results_dir, write_results_part  # type: ignore
 
-    # Copy the image to temp folder for processing
-    import shutil
+        results_dir = run_results_dir(
+            conf.get("results_dir", DEFAULT_RESULTS_DIR), context["dag_run"].run_id
+        )
+        chunk_result = {
+            "results_file": write_results_part(
+                results_df, results_dir, context["task_instance"].map_index
+            ),
+            "rows": len(results_df),
+            "failed": failed,
+            "statistics": stats.to_state(),
+        }
+    else:
+        results = results_df.to_dict("records") if not results_df.empty else []
+        chunk_result = {"results": results + failed, "statistics": stats.to_state()}
 
-    temp_image_path = os.path.join(temp_folder, image_data["filename"])
-    shutil.copy2(image_data["file_path"], temp_image_path)
+    chunk_result["map_index"] = context["task_instance"].map_index
+    if probe_budget:
+        chunk_result["probe_bytes_read"] = (
+            int(results_df["probe_bytes_read"].sum()) if not results_df.empty else 0
+        )
 
-    try:
-        # Classify the image
-        result = classify_images_task(temp_folder)
+    if cache is not None:
+        cache.close()
+        chunk_result["cache_stats"] = cache.stats()
 
-        # Clean up temp folder
-        shutil.rmtree(temp_folder, ignore_errors=True)
+    progress.finish()
+    return chunk_result
 
-        if result["status"] == "success" and result["results"]:
-            # Extract the classification result for this specific image
-            image_result = result["results"][0]
-            image_result["batch_id"] = image_data["batch_id"]
-            image_result["original_file_path"] = image_data["file_path"]
 
-            logging.info(
-                f"Successfully classified {image_data['filename']}: {image_result['resolution_category']}"
-            )
-            return image_result
-        else:
-            logging.error(f"Failed to classify {image_data['filename']}")
-            return {
-                "filename": image_data["filename"],
-                "status": "error",
-                "error_message": "Classification failed",
-                "batch_id": image_data["batch_id"],
-            }
+def _collect_mapped_results(
+    task_instance, expected_count: int
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Fetch the return values of every mapped transform_classify_image instance
+
+    Pulling a mapped task's return_value without map_indexes gives a lazy
+    sequence over all map indexes that Airflow fetches with one query, so this
+    does not cost one database round-trip per chunk. The results are returned
+    as a list alongside the map indexes in range(expected_count) that produced
+    no result (failed, skipped or upstream-failed instances). Each result is a
+    small per-chunk summary, so keeping them in a list is cheap.
+    """
+    pulled = task_instance.xcom_pull(
+        task_ids="transform_classify_image", key="return_value"
+    )
+    if isinstance(pulled, dict):
+        # A single mapped instance may come back as a bare value
+        pulled = [pulled]
+
+    results = []
+    seen_map_indexes = set()
+    for result in pulled or []:
+        if result:
+            results.append(result)
+            seen_map_indexes.add(result.get("map_index"))
+
+    missing = sorted(set(range(expected_count)) - seen_map_indexes)
+    if missing:
+        logging.warning(
+            f"No transform results for {len(missing)} of {expected_count} "
+            f"map indexes: {missing[:20]}"
+        )
 
-    except Exception as e:
-        logging.error(f"Error processing {image_data['filename']}: {str(e)}")
-        # Clean up temp folder
-        shutil.rmtree(temp_folder, ignore_errors=True)
+    return results, missing
+
+
+def _scanned_paths(task_instance) -> set:
+    """
+    Absolute paths of every image the run's extract found
+
+    Incremental runs only put changed images in the manifest, so their full
+    scan comes from the pending watermark snapshot instead.
+    """
+    from manifest import read_manifest_paths, read_snapshot  # type: ignore
+
+    pending_path = task_instance.xcom_pull(
+        task_ids="extract_images", key="watermark_pending"
+    )
+    if pending_path and os.path.exists(pending_path):
+        paths = read_snapshot(pending_path)
+    else:
+        manifest = task_instance.xcom_pull(task_ids="extract_images", key="manifest")
+        if not manifest or not os.path.exists(manifest["path"]):
+            return set()
+        paths = read_manifest_paths(manifest["path"])
+    return {os.path.abspath(path) for path in paths}
+
+
+def _iter_result_frames(
+    results_files: List[str],
+    inline_results: List[Dict[str, Any]],
+    drop_probe_bytes: bool,
+    chunk_rows: Optional[int] = None,
+):
+    """
+    Yield the run's successful results as DataFrames, one batch at a time
+
+    Arrow part files are memory-mapped and converted one record batch at a
+    time; inline results are framed chunk_rows (default JSON_CHUNK_ROWS) at a
+    time. Every batch is reclassified from its dimensions in one vectorized
+    pass, so the load step never holds more than one batch of records.
+    """
+    import pandas as pd
+    from outputs import JSON_CHUNK_ROWS  # type: ignore
+
+    classifier = ImageClassifier()
+    chunk_rows = chunk_rows or JSON_CHUNK_ROWS
+
+    def frames():
+        if results_files:
+            from handoff import iter_results_batches  # type: ignore
+
+            for batch in iter_results_batches(results_files):
+                frame = batch.to_pandas()
+                if drop_probe_bytes:
+                    # Only budgeted probing records bytes read; keep other runs' output unchanged
+                    frame = frame.drop(columns="probe_bytes_read")
+                yield frame
+        for start in range(0, len(inline_results), chunk_rows):
+            yield pd.DataFrame(inline_results[start : start + chunk_rows])
+
+    for frame in frames():
+        if frame.empty:
+            continue
+        frame["resolution_category"] = classifier.classify_resolutions(
+            frame["width"], frame["height"]
+        )
+        yield frame
 
-        return {
-            "filename": image_data["filename"],
-            "status": "error",
-            "error_message": str(e),
-            "batch_id": image_data["batch_id"],
-        }
+
+def _record_chunks(frames, data_writer=None):
+    """Yield each frame's records for the results JSON, writing the frame to data_writer on the way"""
+    for frame in frames:
+        if data_writer is not None:
+            data_writer.write_batch(frame)
+        yield frame.to_dict("records")
 
 
 def load_aggregate_results(**context) -> Dict[str, Any]:
@@ -194,117 +496,219 @@ def load_aggregate_results(**context) -> Dict[str, Any]:
     # Get all results from the previous task
     task_instance = context["task_instance"]
 
-    # Get results from all mapped tasks
-    mapped_results = []
+    from aggregate import ResultAggregator  # type: ignore
+    from cache import ClassificationCache  # type: ignore
+
+    conf = context["dag_run"].conf
+
+    # Collect results from all mapped instances with a single lazily streamed pull
+    chunk_count = task_instance.xcom_pull(task_ids="extract_images", key="chunk_count")
+    chunk_results, missing_map_indexes = _collect_mapped_results(
+        task_instance, chunk_count or 0
+    )
+
+    # One pass over the chunk results: inline records and/or Arrow part files,
+    # merged statistics states, cache counters and errors by type
+    aggregator = ResultAggregator(quantiles=bool(conf.get("quantiles")))
+    for result in chunk_results:
+        aggregator.add_chunk(result)
+    results_files = aggregator.results_files
+    failed_results = aggregator.failed
+    cache_stats = aggregator.cache_stats
+
+    successful_count = aggregator.statistics.total_images
 
-    # Get the task instance of the transform task
-    transform_task = context["dag"].get_task("transform_classify_image")
+    logging.info(
+        "Aggregated %d classification results", successful_count + len(failed_results)
+    )
 
-    # Collect results from all mapped instances
-    for map_index in range(len(context["dag_run"].conf.get("image_list", []))):
-        try:
-            result = task_instance.xcom_pull(
-                task_ids="transform_classify_image",
-                dag_id=context["dag"].dag_id,
-                run_id=context["dag_run"].run_id,
-                key=f"return_value_{map_index}",
+    # Aggregated statistics come from the merged chunk states, not the records
+    stats = aggregator.to_statistics()
+    if missing_map_indexes:
+        stats["missing_map_indexes"] = missing_map_indexes
+    # Drop cache entries for images under input_folder that have disappeared
+    # since they were cached; the images this run scanned are not stat'ed again
+    cache_path = conf.get("cache_path", DEFAULT_CACHE_PATH)
+    if cache_path and os.path.exists(cache_path):
+        scanned = _scanned_paths(task_instance)
+        with ClassificationCache(cache_path) as cache:
+            cache_stats["evictions"] = cache.evict_missing(
+                conf.get("input_folder", "/opt/airflow/data/input"), scanned
             )
-            if result:
-                mapped_results.append(result)
-        except Exception as e:
-            logging.warning(f"Could not get result for map_index {map_index}: {e}")
-
-    logging.info(f"Aggregated {len(mapped_results)} classification results")
-
-    # Separate successful and failed classifications
-    successful_results = [r for r in mapped_results if r.get("status") != "error"]
-    failed_results = [r for r in mapped_results if r.get("status") == "error"]
-
-    # Generate aggregated statistics
-    if successful_results:
-        import pandas as pd
-
-        df = pd.DataFrame(successful_results)
-
-        # Calculate statistics
-        stats = {
-            "total_images_processed": len(mapped_results),
-            "successful_classifications": len(successful_results),
-            "failed_classifications": len(failed_results),
-            "resolution_distribution": df["resolution_category"]
-            .value_counts()
-            .to_dict(),
-            "avg_file_size_mb": (
-                round(df["file_size_mb"].mean(), 2)
-                if "file_size_mb" in df.columns
-                else 0
-            ),
-            "total_size_mb": (
-                round(df["file_size_mb"].sum(), 2)
-                if "file_size_mb" in df.columns
-                else 0
-            ),
-            "avg_aspect_ratio": (
-                round(df["aspect_ratio"].mean(), 2)
-                if "aspect_ratio" in df.columns
-                else 0
-            ),
-        }
-    else:
-        stats = {
-            "total_images_processed": len(mapped_results),
-            "successful_classifications": 0,
-            "failed_classifications": len(failed_results),
-            "resolution_distribution": {},
-            "avg_file_size_mb": 0,
-            "total_size_mb": 0,
-            "avg_aspect_ratio": 0,
-        }
+        stats["cache"] = cache_stats
 
     # Save results to output location
-    output_folder = context["dag_run"].conf.get(
-        "output_folder", "/opt/airflow/data/output"
-    )
+    output_folder = conf.get("output_folder", "/opt/airflow/data/output")
     os.makedirs(output_folder, exist_ok=True)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # Save detailed results as JSON
+    from contextlib import ExitStack
+
+    from outputs import (  # type: ignore
+        DEFAULT_PART_ROWS,
+        OUTPUT_LAYOUTS,
+        JsonDocumentWriter,
+        PartitionedResultWriter,
+        atomic_output,
+        json_extension,
+        open_result_writer,
+        output_extension,
+        remove_stale_parts,
+        run_token,
+        write_partition_index,
+    )
+
+    # Output names derive from the run_id, so a retry overwrites its own outputs.
+    # Every file is written to a temporary path, fsynced and atomically renamed.
+    token = run_token(context["dag_run"].run_id)
+    json_compression = conf.get("json_compression")
     results_file = os.path.join(
-        output_folder, f"classification_results_{timestamp}.json"
+        output_folder,
+        f"classification_results_{token}" + json_extension(json_compression),
     )
-    with open(results_file, "w") as f:
-        json.dump(
+    output_format = conf.get("output_format", "csv")
+    output_compression = conf.get("output_compression", "gzip")
+    output_layout = conf.get("output_layout", "flat")
+    if output_layout not in OUTPUT_LAYOUTS:
+        raise ValueError(
+            f"Unknown output layout {output_layout!r}, expected one of {OUTPUT_LAYOUTS}"
+        )
+    partitioned = output_layout == "partitioned"
+    partition_date = context.get("ds") or datetime.now().strftime("%Y-%m-%d")
+    data_file = os.path.join(
+        output_folder,
+        f"classification_results_{token}"
+        + output_extension(output_format, output_compression),
+    )
+
+    # One streaming pass over the results: each batch goes to the data writer
+    # (csv, parquet, arrow, ndjson; flat or partitioned) and into the results
+    # JSON, which is written header and statistics first
+    result_frames = _iter_result_frames(
+        results_files, aggregator.successful, aggregator.probe_bytes_read is None
+    )
+    with ExitStack() as writers:
+        data_writer = None
+        if partitioned:
+            # category=<resolution_category>/date=<ds>/part-N files plus a per-run index
+            data_writer = writers.enter_context(
+                PartitionedResultWriter(
+                    output_folder,
+                    partition_date,
+                    token,
+                    output_format,
+                    output_compression,
+                    conf.get("partition_max_rows", DEFAULT_PART_ROWS),
+                )
+            )
+        elif successful_count:
+            data_writer = writers.enter_context(
+                open_result_writer(
+                    writers.enter_context(atomic_output(data_file)),
+                    output_format,
+                    output_compression,
+                )
+            )
+
+        json_writer = writers.enter_context(
+            JsonDocumentWriter(
+                writers.enter_context(atomic_output(results_file)), json_compression
+            )
+        )
+        json_writer.write_fields(
             {
                 "batch_id": context["dag_run"].run_id,
                 "timestamp": timestamp,
                 "statistics": stats,
-                "successful_results": successful_results,
-                "failed_results": failed_results,
+            }
+        )
+        json_writer.write_array(
+            "successful_results", _record_chunks(result_frames, data_writer)
+        )
+        json_writer.write_array("failed_results", [failed_results])
+
+    output_files = [results_file]
+    if partitioned:
+        parts = data_writer.parts
+        # The index is the run's commit marker, written after all of its parts
+        index_file = write_partition_index(
+            output_folder,
+            token,
+            {
+                "batch_id": context["dag_run"].run_id,
+                "timestamp": timestamp,
+                "date": partition_date,
+                "format": output_format,
+                "results_file": os.path.basename(results_file),
+                "rows": successful_count,
+                "partitions": parts,
             },
-            f,
-            indent=2,
         )
-
-    # Save successful results as CSV
-    if successful_results:
-        csv_file = os.path.join(
-            output_folder, f"classification_results_{timestamp}.csv"
+        output_files.append(index_file)
+        remove_stale_parts(output_folder, token, parts)
+        logging.info(
+            "Results saved to %d partition files, indexed in %s", len(parts), index_file
         )
-        df.to_csv(csv_file, index=False)
-        logging.info(f"Results saved to {csv_file}")
+    elif successful_count:
+        logging.info(f"Results saved to {data_file}")
 
     logging.info(f"Final results saved to {results_file}")
     logging.info(f"Statistics: {stats}")
 
+    # Results are saved, so incremental runs can now advance the scan watermark.
+    # Failed images stay out of it and are retried by the next run.
+    pending_path = task_instance.xcom_pull(
+        task_ids="extract_images", key="watermark_pending"
+    )
+    # A retry after a successful commit finds the pending snapshot already promoted
+    if pending_path and os.path.exists(pending_path):
+        from manifest import ScanWatermark  # type: ignore
+
+        watermark = ScanWatermark(conf.get("state_path", DEFAULT_STATE_PATH))
+        committed = watermark.commit(
+            pending_path,
+            exclude=[r["original_file_path"] for r in failed_results],
+        )
+        logging.info(f"Scan watermark now covers {committed} images")
+
     return {
         "status": "success",
-        "output_files": [results_file],
+        "output_files": output_files,
         "statistics": stats,
         "batch_id": context["dag_run"].run_id,
     }
 
 
+def cleanup_run_files(**context) -> None:
+    """
+    Task 4: Cleanup - Remove the run's intermediate files once its outputs are committed
+
+    The Arrow part files and the extract manifest are load_aggregate_results'
+    inputs. Deleting them in a task of their own, downstream of a successful
+    load, lets a retried load rebuild its outputs from the same inputs. A
+    retried cleanup finds nothing left to remove.
+    """
+    import shutil
+
+    from handoff import run_results_dir  # type: ignore
+
+    conf = context["dag_run"].conf
+    run_id = context["dag_run"].run_id
+
+    results_dir = run_results_dir(conf.get("results_dir", DEFAULT_RESULTS_DIR), run_id)
+    if os.path.isdir(results_dir):
+        shutil.rmtree(results_dir)
+        logging.info(f"Removed result parts in {results_dir}")
+
+    manifest = context["task_instance"].xcom_pull(
+        task_ids="extract_images", key="manifest"
+    )
+    if manifest and os.path.exists(manifest["path"]):
+        os.remove(manifest["path"])
+        logging.info(f"Removed image manifest {manifest['path']}")
+
+
 # Task definitions
 start_task = EmptyOperator(task_id="start", dag=dag)
 
@@ -312,18 +716,23 @@ extract_task = PythonOperator(
     task_id="extract_images", python_callable=extract_images, dag=dag
 )
 
-# Dynamic task mapping for transform
+# Dynamic task mapping for transform, one mapped instance per chunk of images
 transform_task = PythonOperator.partial(
     task_id="transform_classify_image",
     python_callable=transform_classify_image,
     dag=dag,
-).expand(image_data=extract_task.output)
+).expand(image_slice=extract_task.output)
 
 load_task = PythonOperator(
     task_id="load_aggregate_results", python_callable=load_aggregate_results, dag=dag
 )
 
+# Runs only after a successful load, so a failed load keeps its inputs for the retry
+cleanup_task = PythonOperator(
+    task_id="cleanup_run_files", python_callable=cleanup_run_files, dag=dag
+)
+
 end_task = EmptyOperator(task_id="end", dag=dag)
 
 # Task dependencies
-start_task >> extract_task >> transform_task >> load_task >> end_task
+start_task >> extract_task >> transform_task >> load_task >> cleanup_task >> end_task
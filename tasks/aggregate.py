@@ -0,0 +1,83 @@
+"""
+Single-pass aggregation of the mapped transform results in the load step
+
+ResultAggregator consumes every chunk result exactly once. In that pass it
+merges the chunk's RunningStatistics state, sums the cache counters and probe
+bytes, splits inline records into successes and failures, and counts failures
+by error type. The load step then renders all run statistics from the
+aggregator without another pass over the records.
+"""
+
+from typing import Dict, List, Optional
+
+from stats import RunningStatistics
+
+# Error type of failure records that predate the error_type field
+UNKNOWN_ERROR_TYPE = 'Unknown'
+
+
+class ResultAggregator:
+    """Folds per-chunk transform results into run-level results and statistics"""
+
+    def __init__(self, quantiles: bool = False):
+        self.statistics = RunningStatistics(quantiles=quantiles)
+        self.results_files: List[str] = []
+        self.successful: List[Dict] = []
+        self.failed: List[Dict] = []
+        self.errors_by_type: Dict[str, int] = {}
+        self.cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+        self.probe_bytes_read: Optional[int] = None
+
+    def add_chunk(self, result: Dict) -> None:
+        """Fold one mapped task's result: Arrow part file or inline records, plus its statistics"""
+        if 'results_file' in result:
+            self.results_files.append(result['results_file'])
+            for record in result['failed']:
+                self._add_failure(record)
+        else:
+            for record in result['results']:
+                if record.get('status') == 'error':
+                    self._add_failure(record)
+                else:
+                    self.successful.append(record)
+
+        self.statistics.merge(RunningStatistics.from_state(result['statistics']))
+        for counter, value in result.get('cache_stats', {}).items():
+            self.cache_stats[counter] += value
+        if 'probe_bytes_read' in result:
+            self.probe_bytes_read = (self.probe_bytes_read or 0) + result['probe_bytes_read']
+
+    def _add_failure(self, record: Dict) -> None:
+        self.failed.append(record)
+        error_type = record.get('error_type', UNKNOWN_ERROR_TYPE)
+        self.errors_by_type[error_type] = self.errors_by_type.get(error_type, 0) + 1
+
+    def to_statistics(self) -> Dict:
+        """
+        Run statistics: counts, distribution, size and resolution summaries,
+        bytes per category, errors by type and, for budgeted probing, bytes read
+        """
+        merged = self.statistics.to_dict()
+        successful = self.statistics.total_images
+        distribution = merged.get('resolution_distribution', {})
+
+        stats = {
+            'total_images_processed': successful + len(self.failed),
+            'successful_classifications': successful,
+            'failed_classifications': len(self.failed),
+            'resolution_distribution': distribution,
+            'avg_file_size_mb': merged.get('avg_file_size_mb', 0),
+            'total_size_mb': merged.get('total_size_mb', 0),
+            'avg_aspect_ratio': merged.get('avg_aspect_ratio', 0),
+            'resolution_summary': merged.get('resolution_summary', {}),
+            # Same category order as the distribution: most images first
+            'size_bytes_by_category': {
+                category: self.statistics.category_bytes.get(category, 0) for category in distribution
+            },
+            'errors_by_type': dict(sorted(self.errors_by_type.items(), key=lambda item: item[1], reverse=True)),
+        }
+        if 'quantiles' in merged:
+            stats['quantiles'] = merged['quantiles']
+        if self.probe_bytes_read is not None:
+            stats['probe_bytes_read'] = self.probe_bytes_read
+        return stats
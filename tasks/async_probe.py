@@ -0,0 +1,73 @@
+"""
+asyncio engine for latency-bound image probing
+
+Header probes are tiny reads, so on network filesystems and object-store
+mounts their cost is almost entirely round-trip latency. This engine keeps
+thousands of probes in flight from a single worker: blocking reads are offloaded
+to a dedicated thread pool sized to the concurrency limit, each probe gets a
+timeout, and callers consume results in input order through a bounded window
+that applies backpressure to the producer.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 512
+DEFAULT_TIMEOUT = 30.0
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+async def ordered_bounded_map(func: Callable[[T], Awaitable[R]], items: Iterable[T],
+                              concurrency: int = DEFAULT_CONCURRENCY) -> AsyncIterator[R]:
+    """
+    Run func over items with at most concurrency calls in flight, yielding results in input order
+
+    Items are pulled from the iterable only as slots free up, so an arbitrarily
+    long (lazy) input is never materialized.
+    """
+    window = deque()
+    for item in items:
+        if len(window) >= concurrency:
+            yield await window.popleft()
+        window.append(asyncio.ensure_future(func(item)))
+
+    while window:
+        yield await window.popleft()
+
+
+class ThreadedProbeRunner:
+    """Runs blocking probe calls on a dedicated thread pool with a per-call timeout"""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.timeouts = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    async def __aenter__(self) -> 'ThreadedProbeRunner':
+        # The default loop executor is capped at a few dozen threads; size ours to the window
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='probe')
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # Timed-out reads may still be blocked in the kernel; don't wait for them
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    async def run(self, func: Callable[[T], R], arg: T, label: str = '') -> Optional[R]:
+        """Run func(arg) on the pool, returning None if it does not finish within the timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, func, arg)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Timed out after {self.timeout}s probing {label or arg}")
+            return None
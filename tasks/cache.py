@@ -0,0 +1,215 @@
+"""
+Persistent on-disk cache of image classification results
+
+Entries are keyed by absolute path and validated against the file's size and
+mtime_ns, so unchanged images are never re-probed between runs. With
+hash_content enabled, a BLAKE2 digest of the file is stored as well and an
+entry whose mtime changed but whose content did not (touch, copy with new
+timestamps) is revalidated instead of re-probed; this costs a full read of
+the file on every miss, so it is off by default.
+
+Lookups only read. Invalidations, revalidated mtimes and new entries are
+queued in memory and written by commit() in one short transaction, so the
+database is never write-locked while a window of images is being probed or
+hashed. A write that fails (e.g. the database stays locked by another mapped
+task past LOCK_TIMEOUT) is logged and dropped: the affected images are simply
+probed again next time.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Container, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait on a database locked by another mapped task before failing
+LOCK_TIMEOUT = 30
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    resolution_category TEXT NOT NULL
+)
+"""
+
+
+def content_hash(path: str) -> str:
+    """BLAKE2b digest of the whole file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ClassificationCache:
+    """SQLite-backed cache of (width, height, category, file size) per image file"""
+
+    def __init__(self, db_path: str, hash_content: bool = False):
+        self.db_path = db_path
+        self.hash_content = hash_content
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # The async engine looks entries up from its probe threads; the lock
+        # serializes every use of the shared connection and the write queues
+        self._lock = threading.Lock()
+        # Writes queued until commit(), keyed by absolute path
+        self._deletes = set()
+        self._mtime_updates: Dict[str, int] = {}
+        self._stores: Dict[str, Tuple] = {}
+        self._conn = sqlite3.connect(db_path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    def __enter__(self) -> 'ClassificationCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def lookup(self, path: str, size: int, mtime_ns: int) -> Optional[Dict]:
+        """Return the cached classification for path if it is still valid for size and mtime, else None"""
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self._stores.get(key)
+            if row is None and key not in self._deletes:
+                try:
+                    row = self._conn.execute(
+                        'SELECT size, mtime_ns, content_hash, width, height, resolution_category '
+                        'FROM classifications WHERE path = ?',
+                        (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning("Classification cache lookup failed for %s: %s", path, e)
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+
+        cached_size, cached_mtime_ns, cached_hash, width, height, category = row
+        valid = cached_size == size and cached_mtime_ns == mtime_ns
+
+        if not valid and self.hash_content and cached_hash and cached_size == size:
+            # Same size, new mtime: trust the entry if the content is unchanged.
+            # Hashed outside the lock; nothing is written until commit()
+            valid = content_hash(path) == cached_hash
+            if valid:
+                with self._lock:
+                    self._mtime_updates[key] = mtime_ns
+
+        with self._lock:
+            if not valid:
+                self._deletes.add(key)
+                self._stores.pop(key, None)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {
+            'width': width,
+            'height': height,
+            'resolution_category': category,
+            'file_size_bytes': cached_size
+        }
+
+    def store(self, path: str, size: int, mtime_ns: int, width: int, height: int,
+              resolution_category: str) -> None:
+        """Queue the classification of path as of size and mtime; commit() writes it"""
+        # Hash before queueing, so commit() never reads files
+        digest = content_hash(path) if self.hash_content else None
+        key = os.path.abspath(path)
+        with self._lock:
+            self._deletes.discard(key)
+            self._mtime_updates.pop(key, None)
+            self._stores[key] = (size, mtime_ns, digest, width, height, resolution_category)
+
+    def evict_missing(self, root: str, present: Container[str] = frozenset()) -> int:
+        """
+        Delete entries under root whose files no longer exist and return how many were removed
+
+        Only entries under root are checked, so caches shared with other input
+        folders (possibly not mounted here) are left alone. Paths in present,
+        e.g. the images a run's scan just found, are known to exist and are not
+        stat'ed, so a steady-state run stats only the entries it did not see.
+        """
+        prefix = os.path.join(os.path.abspath(root), '')
+        # Every path starting with prefix sorts between it and prefix with its last character bumped
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self._lock:
+            self._flush()
+            missing = [
+                (path,) for (path,) in self._conn.execute(
+                    'SELECT path FROM classifications WHERE path >= ? AND path < ?', (prefix, upper)
+                )
+                if path not in present and not os.path.exists(path)
+            ]
+            try:
+                with self._conn:
+                    self._conn.executemany('DELETE FROM classifications WHERE path = ?', missing)
+            except sqlite3.Error as e:
+                logger.warning("Could not evict %d classification cache entries from %s: %s",
+                               len(missing), self.db_path, e)
+                return 0
+            self.evictions += len(missing)
+        return len(missing)
+
+    def commit(self) -> None:
+        """Write the queued invalidations, mtime updates and entries in one transaction"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not (self._deletes or self._mtime_updates or self._stores):
+            return
+        try:
+            with self._conn:
+                self._conn.executemany('DELETE FROM classifications WHERE path = ?',
+                                       [(key,) for key in self._deletes])
+                self._conn.executemany('UPDATE classifications SET mtime_ns = ? WHERE path = ?',
+                                       [(mtime_ns, key) for key, mtime_ns in self._mtime_updates.items()])
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO classifications '
+                    '(path, size, mtime_ns, content_hash, width, height, resolution_category) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(key,) + row for key, row in self._stores.items()]
+                )
+        except sqlite3.Error as e:
+            # Never fail classification over the cache; these images are re-probed next run
+            logger.warning("Could not write %d classification cache entries to %s: %s",
+                           len(self._deletes) + len(self._mtime_updates) + len(self._stores),
+                           self.db_path, e)
+        self._deletes.clear()
+        self._mtime_updates.clear()
+        self._stores.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss, invalidation and eviction counts since this cache was opened"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions
+        }
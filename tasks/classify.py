@@ -1,17 +1,87 @@
 import os
 import pandas as pd
 import numpy as np
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import logging
-from typing import Dict, List, Tuple
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 from datetime import datetime
 
+from async_probe import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, ThreadedProbeRunner, ordered_bounded_map
+from cache import ClassificationCache
+from metrics import NULL_METRICS, PipelineMetrics
+from outputs import OUTPUT_FORMATS, open_result_writer, output_extension
+from progress import DEFAULT_EVERY_SECONDS, ProgressLogger
+from records import RecordStore, valid_dimensions
+from probe import DEFAULT_BYTE_BUDGET, HEADER_BYTES, ProbeBudgetExceeded, probe_dimensions, probe_with_budget
+from scanner import ImageEntry, ImagePath, entry_for_path, list_images, scan_images, stat_image
+from stats import RunningStatistics
+
 logger = logging.getLogger(__name__)
 
+# (width, height, bytes read) of a probed image; bytes read is only tracked by the 'budget' engine
+Probe = Tuple[int, int, Optional[int]]
+
+# Error type reported for images that were read but declare zero or out-of-range dimensions
+INVALID_DIMENSIONS = 'InvalidDimensions'
+
+
+class ProbeFailure(NamedTuple):
+    """An image whose dimensions could not be read, with the error type to report for it"""
+    error_type: str
+
+
+ProbeResult = Union[Probe, ProbeFailure]
+
+
+def _stat_listed(image: ImagePath, min_size: Optional[int] = None,
+                 max_size: Optional[int] = None) -> Optional[ImageEntry]:
+    """scanner.stat_image for pool workers: None if out of bounds or gone since the listing"""
+    try:
+        return stat_image(image, min_size, max_size)
+    except OSError:
+        return None
+
+
+def resolution_distribution(categories: pd.Series) -> Dict[str, int]:
+    """Count images per resolution category, leaving out categories with no images"""
+    counts = categories.value_counts()
+    return counts[counts > 0].to_dict()
+
 class ImageClassifier:
     """Image classifier that categorizes images based on resolution"""
     
-    def __init__(self):
+    PROBE_ENGINES = ('header', 'pil', 'budget')
+    EXECUTORS = ('serial', 'threads', 'processes')
+    
+    # Paths handed to each worker process at a time, amortizing pickling overhead
+    PROCESS_CHUNKSIZE = 64
+    
+    # Images classified per window when streaming; bounds memory held at once
+    BATCH_SIZE = 1000
+    
+    def __init__(self, probe_engine: str = 'header', executor: str = 'serial',
+                 max_workers: Optional[int] = None, cache: Optional[ClassificationCache] = None,
+                 probe_head_bytes: int = HEADER_BYTES, probe_budget: int = DEFAULT_BYTE_BUDGET,
+                 metrics: Optional[PipelineMetrics] = None, progress: Optional[ProgressLogger] = None):
+        if probe_engine not in self.PROBE_ENGINES:
+            raise ValueError(f"Unknown probe engine {probe_engine!r}, expected one of {self.PROBE_ENGINES}")
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r}, expected one of {self.EXECUTORS}")
+        self.probe_engine = probe_engine
+        self.executor = executor
+        self.max_workers = max_workers
+        self.cache = cache
+        # Only used by the 'budget' engine, which records probe_bytes_read per image
+        self.probe_head_bytes = probe_head_bytes
+        self.probe_budget = probe_budget
+        # Disabled (a no-op collector) unless a PipelineMetrics instance is passed
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        # Per-image results are only logged at DEBUG; progress aggregates them at INFO
+        self.progress = progress
         self.resolution_categories = {
             '240p': (320, 240),
             '480p': (854, 480), 
@@ -20,83 +90,454 @@ class ImageClassifier:
             '4K': (3840, 2160)
         }
     
+    def __getstate__(self) -> Dict:
+        # Worker processes only probe files; the cache, metrics and progress stay with the parent
+        state = self.__dict__.copy()
+        state['cache'] = None
+        state['metrics'] = NULL_METRICS
+        state['progress'] = None
+        return state
+    
     def get_image_resolution(self, image_path: str) -> Tuple[int, int]:
-        """Extract image resolution using PIL"""
+        """Extract image resolution from the file header, falling back to PIL"""
+        return self._read_resolution(image_path)[:2]
+    
+    def probe_resolution_budgeted(self, image_path: str) -> Tuple[int, int, int]:
+        """Extract image resolution reading at most probe_budget bytes; returns (width, height, bytes_read)"""
+        return self._read_resolution_budgeted(image_path)[:3]
+    
+    def _read_resolution(self, image_path: str) -> Tuple[int, int, Optional[int], Optional[str]]:
+        """
+        Read (width, height, bytes_read, error_type) with the configured probe engine
+        
+        Unreadable images give 0x0 and the name of the exception that stopped
+        the probe; bytes_read is only tracked by the 'budget' engine.
+        """
+        if self.probe_engine == 'budget':
+            return self._read_resolution_budgeted(image_path)
         try:
+            if self.probe_engine == 'header':
+                size = probe_dimensions(image_path)
+                if size is not None:
+                    return size[0], size[1], None, None
+            
             with Image.open(image_path) as img:
                 width, height = img.size
-                return width, height
+                return width, height, None, None
         except Exception as e:
-            logger.error(f"Error reading image {image_path}: {e}")
-            return 0, 0
+            self.metrics.record_error(e)
+            logger.error("Error reading image %s: %s", image_path, e)
+            return 0, 0, None, type(e).__name__
+    
+    def _read_resolution_budgeted(self, image_path: str) -> Tuple[int, int, int, Optional[str]]:
+        try:
+            size, bytes_read = probe_with_budget(image_path, self.probe_head_bytes, self.probe_budget)
+        except OSError as e:
+            self.metrics.record_error(e)
+            logger.error("Error reading image %s: %s", image_path, e)
+            return 0, 0, 0, type(e).__name__
+        
+        if size is None:
+            self.metrics.increment('probe_budget_failures')
+            logger.error("Could not read resolution of %s within %d bytes (%d read)",
+                         image_path, self.probe_budget, bytes_read)
+            # Reading past the budget stops the probe; otherwise neither the header parsers nor PIL recognized the file
+            if bytes_read > self.probe_budget:
+                return 0, 0, bytes_read, ProbeBudgetExceeded.__name__
+            return 0, 0, bytes_read, UnidentifiedImageError.__name__
+        return size[0], size[1], bytes_read, None
     
     def classify_resolution(self, width: int, height: int) -> str:
-        """Classify image based on resolution"""
-        total_pixels = width * height
-        
-        # Define pixel thresholds for each category
-        if total_pixels <= 76800:  # 320x240
-            return '240p'
-        elif total_pixels <= 409920:  # 854x480
-            return '480p'
-        elif total_pixels <= 921600:  # 1280x720
-            return '720p'
-        elif total_pixels <= 2073600:  # 1920x1080
-            return '1080p'
+        """Classify image based on resolution, with the same thresholds as classify_resolutions"""
+        categories, thresholds = self.resolution_thresholds()
+        
+        # A category covers pixel counts up to and including its own threshold
+        return categories[int(np.searchsorted(thresholds, width * height, side='left'))]
+    
+    def resolution_thresholds(self) -> Tuple[List[str], np.ndarray]:
+        """Return categories ordered by pixel count and the upper pixel bound of all but the last"""
+        ordered = sorted(self.resolution_categories.items(), key=lambda item: item[1][0] * item[1][1])
+        categories = [name for name, _ in ordered]
+        thresholds = np.array([width * height for _, (width, height) in ordered[:-1]], dtype=np.int64)
+        return categories, thresholds
+    
+    def classify_resolutions(self, widths, heights) -> pd.Categorical:
+        """Classify arrays of widths and heights in a single vectorized pass"""
+        categories, thresholds = self.resolution_thresholds()
+        total_pixels = np.asarray(widths, dtype=np.int64) * np.asarray(heights, dtype=np.int64)
+        
+        # A category covers pixel counts up to and including its own threshold
+        codes = np.searchsorted(thresholds, total_pixels, side='left')
+        return pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+    
+    def _probe_image(self, entry: ImageEntry) -> ProbeResult:
+        """Probe a scanned image, returning (width, height, bytes_read) or a ProbeFailure if it cannot be read"""
+        # Get image resolution; the file size comes from the scan's stat
+        metrics = self.metrics
+        if metrics.enabled:
+            start = time.perf_counter()
+        
+        width, height, bytes_read, error_type = self._read_resolution(entry.path)
+        
+        if metrics.enabled:
+            metrics.observe('probe_latency_seconds', time.perf_counter() - start)
+            metrics.observe('file_size_bytes', entry.size)
+            if bytes_read is not None:
+                metrics.observe('probe_bytes_read', bytes_read)
+        
+        if error_type is not None:
+            return ProbeFailure(error_type)
+        if not valid_dimensions(width, height):
+            # Dimensions declared zero or out of range (e.g. a corrupt TIFF LONG tag)
+            logger.debug("Could not process %s (%dx%d)", entry.name, width, height)
+            return ProbeFailure(INVALID_DIMENSIONS)
+        
+        return width, height, bytes_read
+    
+    def _make_record(self, entry: ImageEntry, width: int, height: int,
+                     probe_bytes_read: Optional[int] = None) -> Dict:
+        record = {
+            'filename': entry.name,
+            'width': width,
+            'height': height,
+            'total_pixels': width * height,
+            'aspect_ratio': round(width / height, 2),
+            'file_size_bytes': entry.size,
+            'file_size_mb': round(entry.size / (1024 * 1024), 2),
+            'processed_at': datetime.now().isoformat()
+        }
+        if self.probe_engine == 'budget':
+            # Cache hits read nothing from the image
+            record['probe_bytes_read'] = probe_bytes_read or 0
+        return record
+    
+    def _cached_probe(self, entry: ImageEntry) -> Optional[Probe]:
+        """Answer a probe from the cache, or None if the image has to be probed"""
+        cached = self.cache.lookup(entry.path, entry.size, entry.mtime_ns)
+        if cached is None or not valid_dimensions(cached['width'], cached['height']):
+            return None
+        return cached['width'], cached['height'], None
+    
+    def _store_probe(self, entry: ImageEntry, probe: Probe) -> None:
+        width, height, _ = probe
+        self.cache.store(entry.path, entry.size, entry.mtime_ns, width, height,
+                         self.classify_resolution(width, height))
+    
+    def _read_window(self, entries: List[ImageEntry],
+                     read_many: Callable[[List[ImageEntry]], Iterable[ProbeResult]]) -> List[ProbeResult]:
+        """Probe a window of images, only touching the files the cache cannot answer for"""
+        if self.cache is None:
+            with self.metrics.time('probe'):
+                return list(read_many(entries))
+        
+        with self.metrics.time('cache'):
+            probes = [self._cached_probe(entry) for entry in entries]
+        
+        misses = [index for index, probe in enumerate(probes) if probe is None]
+        with self.metrics.time('probe'):
+            probed = list(read_many([entries[index] for index in misses]))
+        for index, probe in zip(misses, probed):
+            probes[index] = probe
+            if not isinstance(probe, ProbeFailure):
+                self._store_probe(entries[index], probe)
+        
+        self.cache.commit()
+        return probes
+    
+    def _entries_for_paths(self, image_paths: Iterable[str],
+                           failures: Optional[List[Tuple[str, str]]] = None) -> Iterator[ImageEntry]:
+        """
+        Stat image paths into entries, skipping (and logging) ones that cannot be stat'ed
+        
+        Skipped paths are appended to failures, if given, with their error type.
+        """
+        for image_path in image_paths:
+            try:
+                with self.metrics.time('stat'):
+                    entry = entry_for_path(image_path)
+            except OSError as e:
+                self.metrics.record_error(e)
+                logger.error("Error reading image %s: %s", image_path, e)
+                if failures is not None:
+                    failures.append((image_path, type(e).__name__))
+                continue
+            yield entry
+    
+    def classify_file(self, image_path: str,
+                      failures: Optional[List[Tuple[str, str]]] = None) -> Optional[Dict]:
+        """
+        Classify a single image file in place, returning None if it cannot be read
+        
+        An unreadable image is appended to failures, if given, as (path, error type).
+        """
+        entries = list(self._entries_for_paths([image_path], failures))
+        if not entries:
+            if self.progress is not None:
+                self.progress.update(failed=1)
+            return None
+        
+        probe = self._read_window(entries, lambda window: map(self._probe_image, window))[0]
+        failed = isinstance(probe, ProbeFailure)
+        if self.progress is not None:
+            self.progress.update(processed=not failed, failed=failed)
+        if failed:
+            if failures is not None:
+                failures.append((image_path, probe.error_type))
+            return None
+        record = self._make_record(entries[0], *probe)
+        
+        # Classify resolution, keeping the category right after the dimensions
+        resolution_category = self.classify_resolution(record['width'], record['height'])
+        result = {key: record[key] for key in ('filename', 'width', 'height')}
+        result['resolution_category'] = resolution_category
+        result.update(record)
+        
+        logger.debug("Processed %s: %dx%d -> %s", result['filename'], result['width'], result['height'],
+                     resolution_category)
+        return result
+    
+    def classify_paths(self, image_paths: Iterable[str]) -> Tuple[pd.DataFrame, List[Tuple[str, str]]]:
+        """
+        Classify image files in place as one window, also reporting every failure
+        
+        The images share one cache window, so the cache is committed once rather
+        than per image, and are classified in the vectorized record store.
+        
+        Returns:
+            The results in input order (filename is the file's base name) and a
+            (path, error type) pair for every image that could not be classified
+        """
+        failures: List[Tuple[str, str]] = []
+        entries = list(self._entries_for_paths(image_paths, failures))
+        if self.progress is not None and failures:
+            self.progress.update(failed=len(failures))
+        if not entries:
+            return pd.DataFrame(), failures
+        return self._concat(self._classify_batches(entries, len(entries), failures)), failures
+    
+    def classify_files(self, image_paths: Iterable[str]) -> pd.DataFrame:
+        """Classify an iterable of image files in place and return classification results"""
+        return self.classify_entries(self._entries_for_paths(image_paths))
+    
+    def classify_entries(self, entries: Iterable[ImageEntry]) -> pd.DataFrame:
+        """Classify already scanned images; each result's filename is the entry's name"""
+        return self._concat(self._classify_batches(entries, self.BATCH_SIZE))
+    
+    def _concat(self, batches: Iterable[pd.DataFrame]) -> pd.DataFrame:
+        batches = list(batches)
+        if not batches:
+            return pd.DataFrame()
+        return pd.concat(batches, ignore_index=True)
+    
+    def _classify_batches(self, entries: Iterable, batch_size: int,
+                          failures: Optional[List[Tuple[str, str]]] = None,
+                          size_bounds: Optional[Tuple[Optional[int], Optional[int]]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Classify images in windows of batch_size, yielding one DataFrame per non-empty window
+        
+        Images that cannot be read are appended to failures, if given. With
+        size_bounds (min_size, max_size), entries are unstat'ed ImagePaths from
+        scanner.list_images; each window is stat'ed and size-filtered first, on
+        the executor's pool when one is configured.
+        """
+        entries = iter(entries)
+        windows = iter(lambda: list(islice(entries, batch_size)), [])
+        stat = partial(_stat_listed, min_size=size_bounds[0], max_size=size_bounds[1]) if size_bounds else None
+        
+        if self.executor == 'serial':
+            if stat is not None:
+                windows = self._stat_windows(windows, lambda window: map(stat, window))
+            yield from self._classify_windows(windows, lambda window: map(self._probe_image, window), failures)
+            return
+        
+        # Executor.map yields results in input order, so output stays deterministic
+        if self.executor == 'threads':
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            map_kwargs = {}
         else:
-            return '4K'
+            pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            map_kwargs = {'chunksize': self.PROCESS_CHUNKSIZE}
+        
+        with pool:
+            if stat is not None:
+                windows = self._stat_windows(windows, lambda window: pool.map(stat, window, **map_kwargs))
+            yield from self._classify_windows(
+                windows, lambda window: pool.map(self._probe_image, window, **map_kwargs), failures
+            )
     
-    def process_images(self, input_folder: str) -> pd.DataFrame:
-        """Process all images in the input folder and return classification results"""
-        results = []
+    def _stat_windows(self, windows: Iterable[List[ImagePath]],
+                      stat_many: Callable[[List[ImagePath]], Iterable[Optional[ImageEntry]]]) -> Iterator[List[ImageEntry]]:
+        """Stat windows of listed images, dropping the ones filtered out or gone since the listing"""
+        for window in windows:
+            with self.metrics.time('stat'):
+                entries = [entry for entry in stat_many(window) if entry is not None]
+            if entries:
+                yield entries
+    
+    def _classify_windows(self, windows: Iterable[List[ImageEntry]],
+                          read_many: Callable[[List[ImageEntry]], Iterable[ProbeResult]],
+                          failures: Optional[List[Tuple[str, str]]] = None) -> Iterator[pd.DataFrame]:
+        for window in windows:
+            df = self._build_results(window, self._read_window(window, read_many), failures)
+            if not df.empty:
+                yield df
+    
+    def new_record_store(self) -> RecordStore:
+        """Empty columnar store classifying with this classifier's resolution categories"""
+        categories, thresholds = self.resolution_thresholds()
+        return RecordStore(categories, thresholds, track_bytes_read=self.probe_engine == 'budget')
+    
+    def _build_results(self, entries: List[ImageEntry], probes: List[ProbeResult],
+                       failures: Optional[List[Tuple[str, str]]] = None) -> pd.DataFrame:
+        """
+        Collect a window's probes into a classified DataFrame, skipping unreadable images
+        
+        Skipped images are appended to failures, if given, as (path, error type).
+        """
+        store = self.new_record_store()
+        debug = logger.isEnabledFor(logging.DEBUG)
         
+        for entry, probe in zip(entries, probes):
+            if isinstance(probe, ProbeFailure):
+                if failures is not None:
+                    failures.append((entry.path, probe.error_type))
+                continue
+            width, height, bytes_read = probe
+            store.append(entry.name, width, height, entry.size, bytes_read)
+            if debug:
+                logger.debug("Processed %s: %dx%d", entry.name, width, height)
+        failed = len(probes) - len(store)
+        
+        with self.metrics.time('dataframe'):
+            df = store.to_frame()
+        
+        self.metrics.increment('images_processed', len(df))
+        self.metrics.increment('images_failed', failed)
+        if self.progress is not None:
+            self.progress.update(processed=len(df), failed=failed)
+        return df
+    
+    def iter_batches(self, input_folder: str, batch_size: Optional[int] = None,
+                     **scan_options) -> Iterator[pd.DataFrame]:
+        """
+        Classify images in the input folder, yielding results as DataFrames of at most batch_size rows
+        
+        scan_options are passed to scanner.scan_images (recursive, include, exclude,
+        min_size, max_size).
+        """
         if not os.path.exists(input_folder):
             logger.error(f"Input folder {input_folder} does not exist")
-            return pd.DataFrame()
+            return
         
-        # Get all image files
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
-        image_files = []
+        if self.executor == 'serial':
+            entries = self.metrics.timed_iter('listing', scan_images(input_folder, **scan_options))
+            yield from self._classify_batches(entries, batch_size or self.BATCH_SIZE)
+            return
         
-        for file in os.listdir(input_folder):
-            if any(file.lower().endswith(ext) for ext in image_extensions):
-                image_files.append(file)
+        # Overlap the per-file stats on the pool too, not just the probes
+        size_bounds = (scan_options.pop('min_size', None), scan_options.pop('max_size', None))
+        images = self.metrics.timed_iter('listing', list_images(input_folder, **scan_options))
+        yield from self._classify_batches(images, batch_size or self.BATCH_SIZE, size_bounds=size_bounds)
+    
+    def iter_images(self, input_folder: str, batch_size: Optional[int] = None, **scan_options) -> Iterator:
+        """
+        Classify images in the input folder, streaming the results
         
-        logger.info(f"Found {len(image_files)} images to process")
+        Yields one result dict per image, or lists of up to batch_size result
+        dicts when batch_size is given. Only one batch is held in memory at a time.
+        """
+        for df in self.iter_batches(input_folder, batch_size, **scan_options):
+            records = df.to_dict('records')
+            if batch_size:
+                yield records
+            else:
+                yield from records
+    
+    def process_images(self, input_folder: str, **scan_options) -> pd.DataFrame:
+        """Process all images in the input folder and return classification results"""
+        return self._concat(self.iter_batches(input_folder, **scan_options))
+    
+    async def aiter_batches(self, input_folder: str, batch_size: Optional[int] = None,
+                            concurrency: int = DEFAULT_CONCURRENCY, timeout: Optional[float] = DEFAULT_TIMEOUT,
+                            **scan_options) -> AsyncIterator[pd.DataFrame]:
+        """
+        Async counterpart of iter_batches for high-latency storage (NFS, object-store mounts)
         
-        for filename in image_files:
-            image_path = os.path.join(input_folder, filename)
-            
-            # Get image resolution
-            width, height = self.get_image_resolution(image_path)
+        Up to concurrency images are kept in flight on a dedicated thread pool,
+        each bounded by timeout seconds; an image that times out counts as
+        unreadable. Only the directory listing runs on the event loop: the stat,
+        size filter, cache lookup and header probe of each image all run in the
+        offloaded call, since on these mounts a stat costs a round-trip just like
+        the probe. Results keep the listing order. The executor setting is not
+        used here.
+        """
+        if not os.path.exists(input_folder):
+            logger.error(f"Input folder {input_folder} does not exist")
+            return
+        
+        batch_size = batch_size or self.BATCH_SIZE
+        min_size = scan_options.pop('min_size', None)
+        max_size = scan_options.pop('max_size', None)
+        images = self.metrics.timed_iter('listing', list_images(input_folder, **scan_options))
+        
+        def stat_and_probe(image: ImagePath) -> Tuple[Optional[ImageEntry], Optional[ProbeResult]]:
+            try:
+                with self.metrics.time('stat'):
+                    entry = stat_image(image, min_size, max_size)
+            except OSError:
+                # Removed or unreadable between listing and stat, as in scan_images
+                return None, None
+            if entry is None:
+                return None, None
             
-            if width > 0 and height > 0:
-                # Classify resolution
-                resolution_category = self.classify_resolution(width, height)
-                
-                # Get file size
-                file_size = os.path.getsize(image_path)
-                
-                # Calculate aspect ratio
-                aspect_ratio = round(width / height, 2)
-                
-                results.append({
-                    'filename': filename,
-                    'width': width,
-                    'height': height,
-                    'resolution_category': resolution_category,
-                    'total_pixels': width * height,
-                    'aspect_ratio': aspect_ratio,
-                    'file_size_bytes': file_size,
-                    'file_size_mb': round(file_size / (1024 * 1024), 2),
-                    'processed_at': datetime.now().isoformat()
-                })
-                
-                logger.info(f"Processed {filename}: {width}x{height} -> {resolution_category}")
-            else:
-                logger.warning(f"Could not process {filename}")
+            if self.cache is not None:
+                probe = self._cached_probe(entry)
+                if probe is not None:
+                    return entry, probe
+            probe = self._probe_image(entry)
+            if self.cache is not None and not isinstance(probe, ProbeFailure):
+                self._store_probe(entry, probe)
+            return entry, probe
         
-        return pd.DataFrame(results)
+        async with ThreadedProbeRunner(concurrency, timeout) as runner:
+            async def read(image: ImagePath) -> Tuple[Optional[ImageEntry], Optional[ProbeResult]]:
+                result = await runner.run(stat_and_probe, image, label=image.path)
+                if result is None:
+                    # Timed out, possibly before the stat: report the image as unreadable
+                    return ImageEntry(image.name, image.path, 0, 0), ProbeFailure(TimeoutError.__name__)
+                return result
+            window, probes = [], []
+            async for entry, probe in ordered_bounded_map(read, images, concurrency):
+                if entry is None:
+                    # Outside the size bounds, or gone since the listing
+                    continue
+                window.append(entry)
+                probes.append(probe)
+                if len(window) >= batch_size:
+                    df = self._flush_async_batch(window, probes)
+                    window, probes = [], []
+                    if not df.empty:
+                        yield df
+            
+            df = self._flush_async_batch(window, probes)
+            if not df.empty:
+                yield df
+            
+            if runner.timeouts:
+                logger.warning(f"{runner.timeouts} image probes timed out in {input_folder}")
+    
+    def _flush_async_batch(self, entries: List[ImageEntry], probes: List[ProbeResult]) -> pd.DataFrame:
+        if self.cache is not None:
+            self.cache.commit()
+        return self._build_results(entries, probes)
+    
+    async def aprocess_images(self, input_folder: str, concurrency: int = DEFAULT_CONCURRENCY,
+                              timeout: Optional[float] = DEFAULT_TIMEOUT, **scan_options) -> pd.DataFrame:
+        """Async counterpart of process_images; see aiter_batches"""
+        return self._concat([
+            df async for df in self.aiter_batches(input_folder, concurrency=concurrency,
+                                                  timeout=timeout, **scan_options)
+        ])
     
     def generate_statistics(self, df: pd.DataFrame) -> Dict:
         """Generate statistics from the classification results"""
@@ -105,7 +546,7 @@ class ImageClassifier:
         
         stats = {
             'total_images': len(df),
-            'resolution_distribution': df['resolution_category'].value_counts().to_dict(),
+            'resolution_distribution': resolution_distribution(df['resolution_category']),
             'avg_file_size_mb': round(df['file_size_mb'].mean(), 2),
             'total_size_mb': round(df['file_size_mb'].sum(), 2),
             'avg_aspect_ratio': round(df['aspect_ratio'].mean(), 2),
@@ -118,53 +559,155 @@ class ImageClassifier:
         
         return stats
 
-def classify_images_task(input_folder: str, output_file: str = None) -> Dict:
+def classify_images_task(input_folder: str, output_file: str = None, executor: str = 'serial',
+                         max_workers: Optional[int] = None, return_results: bool = True,
+                         batch_size: Optional[int] = None, cache_path: Optional[str] = None,
+                         scan_options: Optional[Dict] = None, probe_budget: Optional[int] = None,
+                         collect_metrics: bool = False, metrics_file: Optional[str] = None,
+                         log_every_seconds: Optional[float] = DEFAULT_EVERY_SECONDS,
+                         log_every_images: Optional[int] = None, output_format: str = 'csv',
+                         output_compression: Optional[str] = 'gzip') -> Dict:
     """
     Main task function for image classification
     
+    Results are streamed batch by batch to the output file while statistics are
+    folded incrementally, so memory stays bounded by the batch size unless
+    return_results asks for every record to be returned.
+    
     Args:
         input_folder: Path to folder containing images
-        output_file: Optional path to save results CSV
+        output_file: Optional path to save results to, in output_format
+        executor: How to probe images: 'serial', 'threads' or 'processes'
+        max_workers: Optional pool size for the threads/processes executors
+        return_results: Whether to include every result record in the return value
+        batch_size: Images classified and written per batch
+        cache_path: Optional classification cache database; unchanged images are not re-probed
+        scan_options: Optional scanner.scan_images filters (recursive, include, exclude,
+            min_size, max_size)
+        probe_budget: Optional maximum bytes read per image; enables the 'budget' probe
+            engine, which records probe_bytes_read per image
+        collect_metrics: Whether to time pipeline stages and return the metrics in the result
+        metrics_file: Optional path of a Prometheus text file to write the metrics to;
+            implies collect_metrics
+        log_every_seconds: Log aggregated progress at most this often (None: no time-based logging)
+        log_every_images: Also log progress after this many images; per-image results are
+            only logged at DEBUG level
+        output_format: 'csv', 'parquet', 'arrow' or 'ndjson' (see outputs.py)
+        output_compression: Compression for ndjson output: 'gzip', 'zstd' or None
     
     Returns:
         Dictionary containing classification results and statistics
     """
-    classifier = ImageClassifier()
+    cache = ClassificationCache(cache_path) if cache_path else None
+    metrics = PipelineMetrics() if collect_metrics or metrics_file else NULL_METRICS
+    progress = ProgressLogger(log_every_seconds, log_every_images)
+    if probe_budget:
+        classifier = ImageClassifier(probe_engine='budget', executor=executor, max_workers=max_workers,
+                                     cache=cache, probe_budget=probe_budget, metrics=metrics,
+                                     progress=progress)
+    else:
+        classifier = ImageClassifier(executor=executor, max_workers=max_workers, cache=cache,
+                                     metrics=metrics, progress=progress)
+    stats = RunningStatistics()
+    probe_bytes_read = 0
+    results = []
+    output = open_result_writer(output_file, output_format, output_compression) if output_file else None
     
     # Process images
     logger.info(f"Starting image classification for folder: {input_folder}")
-    results_df = classifier.process_images(input_folder)
+    try:
+        for batch in classifier.iter_batches(input_folder, batch_size, **(scan_options or {})):
+            # Save results if output file specified
+            if output is not None:
+                with metrics.time('output_write'):
+                    output.write_batch(batch)
+            
+            with metrics.time('statistics'):
+                stats.update_frame(batch)
+            if probe_budget:
+                probe_bytes_read += int(batch['probe_bytes_read'].sum())
+            if return_results:
+                results.extend(batch.to_dict('records'))
+    finally:
+        progress.finish()
+        if output is not None:
+            output.close()
+        if cache is not None:
+            cache.close()
+            logger.info(f"Classification cache: {cache.stats()}")
     
-    if results_df.empty:
-        logger.warning("No images were processed successfully")
-        return {'status': 'error', 'message': 'No images processed'}
+    if metrics_file:
+        metrics.write_prometheus(metrics_file, labels={'input_folder': input_folder})
     
-    # Generate statistics
-    stats = classifier.generate_statistics(results_df)
+    if not stats.total_images:
+        logger.warning("No images were processed successfully")
+        result_data = {'status': 'error', 'message': 'No images processed'}
+        if metrics.enabled:
+            result_data['metrics'] = metrics.to_dict()
+        return result_data
     
-    # Save results if output file specified
-    if output_file:
-        results_df.to_csv(output_file, index=False)
-        logger.info(f"Results saved to {output_file}")
+    if output is not None:
+        logger.info(f"Results saved to {output_file} ({output_format})")
     
     # Prepare return data
     result_data = {
         'status': 'success',
-        'total_images': len(results_df),
-        'statistics': stats,
-        'results': results_df.to_dict('records')
+        'total_images': stats.total_images,
+        'statistics': stats.to_dict()
     }
+    if cache is not None:
+        result_data['cache_stats'] = cache.stats()
+    if probe_budget:
+        result_data['probe_bytes_read'] = probe_bytes_read
+    if metrics.enabled:
+        result_data['metrics'] = metrics.to_dict()
+    if return_results:
+        result_data['results'] = results
     
-    logger.info(f"Classification completed. Processed {len(results_df)} images.")
+    logger.info(f"Classification completed. Processed {stats.total_images} images.")
     return result_data
 
 if __name__ == "__main__":
     # Test the classifier
-    import sys
+    import argparse
     
-    if len(sys.argv) > 1:
-        input_folder = sys.argv[1]
-        result = classify_images_task(input_folder, "classification_results.csv")
-        print(f"Classification result: {result}")
-    else:
-        print("Usage: python classify.py <input_folder>")
+    parser = argparse.ArgumentParser(description="Classify images in a folder by resolution")
+    parser.add_argument('input_folder', help="Folder containing images to classify")
+    parser.add_argument('--output', default=None,
+                        help="Path to save results to (default: classification_results with the format's extension)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help="Output file format")
+    parser.add_argument('--compression', choices=('gzip', 'zstd', 'none'), default='gzip',
+                        help="Compression for ndjson output")
+    parser.add_argument('--executor', choices=ImageClassifier.EXECUTORS, default='serial',
+                        help="Run image probes serially or on a thread/process pool")
+    parser.add_argument('--max-workers', type=int, default=None, help="Pool size for threads/processes")
+    parser.add_argument('--batch-size', type=int, default=None, help="Images classified and written per batch")
+    parser.add_argument('--cache', default=None, help="Classification cache database to reuse between runs")
+    parser.add_argument('--recursive', action='store_true', help="Also classify images in subfolders")
+    parser.add_argument('--include', action='append', help="Glob on the relative path an image must match (repeatable)")
+    parser.add_argument('--exclude', action='append', help="Glob on the relative path of images to skip (repeatable)")
+    parser.add_argument('--min-size', type=int, default=None, help="Skip files smaller than this many bytes")
+    parser.add_argument('--max-size', type=int, default=None, help="Skip files larger than this many bytes")
+    parser.add_argument('--probe-budget', type=int, default=None,
+                        help="Read at most this many bytes per image and record the bytes read")
+    parser.add_argument('--log-every-seconds', type=float, default=DEFAULT_EVERY_SECONDS,
+                        help="Seconds between aggregated progress log lines")
+    parser.add_argument('--log-every-images', type=int, default=None,
+                        help="Also log progress after this many images")
+    parser.add_argument('--metrics', default=None,
+                        help="Time pipeline stages and write the metrics to this Prometheus text file")
+    args = parser.parse_args()
+    compression = None if args.compression == 'none' else args.compression
+    output = args.output or 'classification_results' + output_extension(args.format, compression)
+    
+    result = classify_images_task(args.input_folder, output, executor=args.executor,
+                                  max_workers=args.max_workers, return_results=False,
+                                  batch_size=args.batch_size, cache_path=args.cache,
+                                  scan_options={'recursive': args.recursive, 'include': args.include,
+                                                'exclude': args.exclude, 'min_size': args.min_size,
+                                                'max_size': args.max_size},
+                                  probe_budget=args.probe_budget, metrics_file=args.metrics,
+                                  log_every_seconds=args.log_every_seconds,
+                                  log_every_images=args.log_every_images, output_format=args.format,
+                                  output_compression=compression)
+    print(f"Classification result: {result}")
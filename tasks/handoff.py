@@ -0,0 +1,79 @@
+"""
+Columnar handoff of classification results between DAG tasks
+
+Instead of pushing every result record through XCom (and so through the
+Airflow metadata database), each transform task writes its successful results
+to a compact Arrow IPC file in a shared results directory and returns only a
+small pointer. The load step memory-maps those files and streams their record
+batches, so it never holds more than one batch of results in memory.
+"""
+
+import os
+from typing import Iterable, Iterator
+
+import pandas as pd
+import pyarrow as pa
+
+# Fixed schema so every part file concatenates without type promotion; the
+# category is dictionary-encoded since it only takes a handful of values
+RESULT_SCHEMA = pa.schema([
+    ('filename', pa.string()),
+    ('width', pa.int32()),
+    ('height', pa.int32()),
+    ('resolution_category', pa.dictionary(pa.int8(), pa.string())),
+    ('total_pixels', pa.int64()),
+    ('aspect_ratio', pa.float64()),
+    ('file_size_bytes', pa.int64()),
+    ('file_size_mb', pa.float64()),
+    ('processed_at', pa.string()),
+    ('batch_id', pa.string()),
+    ('original_file_path', pa.string()),
+    ('probe_bytes_read', pa.int64()),
+])
+
+# Rows per record batch in a part file, bounding what a reader holds at once
+PART_BATCH_ROWS = 10000
+
+
+def run_results_dir(results_root: str, run_id: str) -> str:
+    """Shared directory holding the part files of one DAG run"""
+    safe_run_id = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in run_id)
+    return os.path.join(results_root, safe_run_id)
+
+
+def write_results_part(results: pd.DataFrame, results_dir: str, part_index: int) -> str:
+    """
+    Write a chunk's results to an Arrow IPC part file and return its path
+
+    Columns are converted to RESULT_SCHEMA's types; schema columns the results
+    lack (e.g. probe_bytes_read without budgeted probing) are written as nulls.
+    The file is written under a temporary name and renamed into place, so a
+    retried task replaces its part atomically and readers never see a partial file.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"part-{part_index:05d}.arrow")
+    tmp_path = f"{path}.tmp"
+
+    columns = {
+        field.name: (
+            pa.array(results[field.name], from_pandas=True).cast(field.type)
+            if field.name in results
+            else pa.nulls(len(results), field.type)
+        )
+        for field in RESULT_SCHEMA
+    }
+    table = pa.Table.from_pydict(columns, schema=RESULT_SCHEMA)
+
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, RESULT_SCHEMA) as writer:
+            writer.write_table(table, max_chunksize=PART_BATCH_ROWS)
+    os.replace(tmp_path, path)
+    return path
+
+
+def iter_results_batches(paths: Iterable[str]) -> Iterator[pa.RecordBatch]:
+    """Memory-map Arrow IPC part files and yield their record batches in order"""
+    for path in paths:
+        reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index)
@@ -0,0 +1,147 @@
+"""
+Extract manifests and the scan watermark for incremental extraction
+
+An extract manifest is an Arrow IPC file holding the images a DAG run has to
+classify, stored as one compressed record batch per transform chunk. Only its
+path and per-chunk slice descriptors travel through XCom, and each mapped
+transform task reads just its own batch.
+
+The scan watermark is a persisted snapshot of every image already processed,
+mapping its path to (size, mtime_ns). An incremental extract compares the
+current scan against it and only emits new or modified files. The snapshot of
+a run is first written as a pending file and only promoted once the run has
+loaded its results, so a failed run is simply retried from the old watermark.
+"""
+
+import gzip
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import pyarrow as pa
+
+FileSignature = Tuple[int, int]
+
+MANIFEST_SCHEMA = pa.schema([
+    ('filename', pa.string()),
+    ('file_path', pa.string()),
+    ('file_size', pa.int64()),
+])
+
+MANIFEST_COMPRESSION = 'zstd'
+
+
+def write_image_manifest(chunks: Iterable[List[Dict]], path: str) -> List[Dict]:
+    """
+    Write image chunks to an Arrow IPC manifest, one record batch per chunk
+
+    Returns one slice descriptor per chunk ({manifest, batch, offset, rows}),
+    which is all a transform task needs to read its images back.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    slices = []
+    offset = 0
+    tmp_path = f"{path}.tmp"
+    options = pa.ipc.IpcWriteOptions(compression=MANIFEST_COMPRESSION)
+
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, MANIFEST_SCHEMA, options=options) as writer:
+            for index, chunk in enumerate(chunks):
+                columns = {name: [image[name] for image in chunk] for name in MANIFEST_SCHEMA.names}
+                writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=MANIFEST_SCHEMA))
+                slices.append({'manifest': path, 'batch': index, 'offset': offset, 'rows': len(chunk)})
+                offset += len(chunk)
+
+    os.replace(tmp_path, path)
+    return slices
+
+
+def read_manifest_slice(manifest_slice: Dict) -> List[Dict]:
+    """Read back the images of one chunk described by a slice from write_image_manifest"""
+    reader = pa.ipc.open_file(pa.memory_map(manifest_slice['manifest'], 'r'))
+    batch = reader.get_batch(manifest_slice['batch'])
+    if batch.num_rows != manifest_slice['rows']:
+        raise ValueError(
+            f"Manifest {manifest_slice['manifest']} batch {manifest_slice['batch']} has "
+            f"{batch.num_rows} rows, expected {manifest_slice['rows']}"
+        )
+    return batch.to_pylist()
+
+
+def read_manifest_paths(path: str) -> List[str]:
+    """Read the file_path of every image in a manifest"""
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    return reader.read_all().column('file_path').to_pylist()
+
+
+def read_snapshot(path: str) -> Dict[str, FileSignature]:
+    """Read the {path: (size, mtime_ns)} files of a pending or committed snapshot"""
+    with gzip.open(path, 'rt') as f:
+        return json.load(f)['files']
+
+
+class ScanWatermark:
+    """Gzipped JSON snapshot of {path: (size, mtime_ns)} for already processed files"""
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+
+    def load(self) -> Dict[str, FileSignature]:
+        """Load the committed snapshot, or an empty one if no run has committed yet"""
+        if not os.path.exists(self.state_path):
+            return {}
+        with gzip.open(self.state_path, 'rt') as f:
+            files = json.load(f)['files']
+        return {path: (size, mtime_ns) for path, (size, mtime_ns) in files.items()}
+
+    def pending_path(self, run_id: str) -> str:
+        # run_ids contain characters like ':' and '+' that are awkward in file names
+        safe_run_id = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in run_id)
+        return f"{self.state_path}.{safe_run_id}.pending"
+
+    def write_pending(self, snapshot: Dict[str, FileSignature], run_id: str) -> str:
+        """Write this run's full scan snapshot next to the committed one and return its path"""
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        pending_path = self.pending_path(run_id)
+        with gzip.open(pending_path, 'wt') as f:
+            json.dump({'run_id': run_id, 'files': snapshot}, f)
+        return pending_path
+
+    def commit(self, pending_path: str, exclude: Iterable[str] = ()) -> int:
+        """
+        Promote a pending snapshot to the committed watermark
+
+        Paths in exclude (e.g. images that failed to classify) are left out so
+        the next incremental run picks them up again. Returns the number of
+        files in the committed watermark.
+        """
+        files = read_snapshot(pending_path)
+        for path in exclude:
+            files.pop(path, None)
+
+        self.save(files)
+        os.remove(pending_path)
+        return len(files)
+
+    def save(self, snapshot: Dict[str, FileSignature]) -> None:
+        """Atomically replace the committed watermark with snapshot"""
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.state_path}.tmp"
+        with gzip.open(tmp_path, 'wt') as f:
+            json.dump({'files': snapshot}, f)
+        os.replace(tmp_path, self.state_path)
+
+
+def changed_files(snapshot: Dict[str, FileSignature],
+                  previous: Dict[str, FileSignature]) -> set:
+    """Paths in snapshot that are new or whose size or mtime differ from previous"""
+    return {path for path, signature in snapshot.items() if previous.get(path) != signature}
@@ -0,0 +1,213 @@
+"""
+Opt-in hot-path instrumentation for the classifier
+
+PipelineMetrics accumulates per-stage wall time, counters, errors by exception
+type and fixed-bucket histograms (probe latency, bytes read, file size). It
+exports to a dict for task results and to the Prometheus text exposition
+format, e.g. for node_exporter's textfile collector.
+
+Per-image observations (probe latency, errors by type) are made where the
+probe runs, so with the 'processes' executor only the stage timers and
+counters kept by the parent process are collected.
+
+Instrumentation is disabled by default: classes hold the shared NULL_METRICS,
+whose methods do nothing and whose timer is a reusable no-op context manager,
+so disabled call sites cost a method call at most.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, Optional, Sequence, TypeVar
+
+T = TypeVar('T')
+
+METRIC_PREFIX = 'image_classifier'
+
+# Upper bucket bounds; observations above the last bound only land in +Inf
+HISTOGRAM_BUCKETS: Dict[str, Sequence[float]] = {
+    'probe_latency_seconds': (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                              0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'probe_bytes_read': (512, 1024, 4096, 16384, 65536, 262144, 1048576),
+    'file_size_bytes': (16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus 'le' semantics"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Dict[str, int]:
+        """Cumulative counts keyed by upper bound, ending with '+Inf'"""
+        result = {}
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            result['+Inf' if bound == float('inf') else repr(bound)] = running
+        return result
+
+
+class PipelineMetrics:
+    """Thread-safe collector of stage timers, counters, error types and histograms"""
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.histograms: Dict[str, Histogram] = {}
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Add the wall time of the with-block to stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_calls[stage] += 1
+
+    def timed_iter(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Wrap iterable, charging the time spent producing each item to stage"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(stage, time.perf_counter() - start)
+                return
+            self.add_time(stage, time.perf_counter() - start)
+            yield item
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += value
+
+    def record_error(self, error: BaseException) -> None:
+        with self._lock:
+            self.errors[type(error).__name__] += 1
+
+    def observe(self, histogram: str, value: float) -> None:
+        with self._lock:
+            if histogram not in self.histograms:
+                self.histograms[histogram] = Histogram(HISTOGRAM_BUCKETS[histogram])
+            self.histograms[histogram].observe(value)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'stages': {
+                    stage: {'seconds': round(seconds, 6), 'calls': self.stage_calls[stage]}
+                    for stage, seconds in sorted(self.stage_seconds.items())
+                },
+                'counters': dict(sorted(self.counters.items())),
+                'errors_by_type': dict(sorted(self.errors.items())),
+                'histograms': {
+                    name: {'buckets': histogram.cumulative(), 'sum': histogram.sum, 'count': histogram.count}
+                    for name, histogram in sorted(self.histograms.items())
+                },
+            }
+
+    def to_prometheus(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        base_labels = dict(labels or {})
+        lines = []
+
+        def sample(name: str, value: float, extra: Optional[Dict[str, str]] = None) -> None:
+            all_labels = dict(base_labels, **(extra or {}))
+            label_text = ','.join(f'{key}="{_escape(str(val))}"' for key, val in all_labels.items())
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                         else f"{METRIC_PREFIX}_{name} {value}")
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+
+        state = self.to_dict()
+
+        header('stage_seconds_total', 'counter', 'Cumulative wall time spent per pipeline stage')
+        for stage, values in state['stages'].items():
+            sample('stage_seconds_total', values['seconds'], {'stage': stage})
+        header('stage_calls_total', 'counter', 'Number of timed calls per pipeline stage')
+        for stage, values in state['stages'].items():
+            sample('stage_calls_total', values['calls'], {'stage': stage})
+
+        for counter, value in state['counters'].items():
+            header(f'{counter}_total', 'counter', f'Count of {counter.replace("_", " ")}')
+            sample(f'{counter}_total', value)
+
+        header('errors_total', 'counter', 'Errors by exception type')
+        for error_type, value in state['errors_by_type'].items():
+            sample('errors_total', value, {'type': error_type})
+
+        for name, histogram in state['histograms'].items():
+            header(name, 'histogram', f'Distribution of {name.replace("_", " ")}')
+            for bound, value in histogram['buckets'].items():
+                sample(f'{name}_bucket', value, {'le': bound})
+            sample(f'{name}_sum', histogram['sum'])
+            sample(f'{name}_count', histogram['count'])
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, labels: Optional[Dict[str, str]] = None) -> None:
+        """Write the Prometheus text file atomically so a scraper never reads a partial file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus(labels))
+        os.replace(tmp_path, path)
+
+
+class NullMetrics:
+    """Disabled metrics: same interface as PipelineMetrics, every call is a no-op"""
+
+    enabled = False
+    _null_timer = nullcontext()
+
+    def time(self, stage: str):
+        return self._null_timer
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        pass
+
+    def timed_iter(self, stage: str, iterable: Iterable[T]) -> Iterable[T]:
+        return iterable
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def observe(self, histogram: str, value: float) -> None:
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,464 @@
+"""
+Pluggable output formats for classification results
+
+Results are written batch by batch through a ResultWriter, so no format needs
+the whole result set in memory:
+
+    csv      plain CSV, one header row (the historical default)
+    parquet  Parquet with zstd compression; resolution_category is dictionary-encoded
+    arrow    Arrow IPC file with zstd-compressed buffers, memory-mappable by readers
+    ndjson   newline-delimited JSON, gzip (default) or zstd compressed
+
+Parquet and Arrow writers fix their schema from the first batch; later batches
+are cast to it.
+
+JsonDocumentWriter streams the load step's results document (header fields
+and statistics first, then the result arrays chunk by chunk) so memory does
+not grow with the number of records.
+
+PartitionedResultWriter lays results out Hive-style as
+category=<resolution_category>/date=<ds>/part-N-<run>.<ext>, so readers that
+need one category or one day (e.g. pyarrow.dataset with partitioning='hive')
+only open those files. Each run's partition files are listed in a small JSON
+index under _index/, which dataset discovery skips like any '_'-prefixed path.
+
+Output files are committed with atomic_output: written to a hidden temporary
+file, fsynced and renamed into place, so readers see either the previous file
+or the complete new one. Names derive from the Airflow run_id (run_token), so
+a retried load step overwrites its own outputs instead of adding a second set.
+"""
+
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow', 'ndjson')
+NDJSON_COMPRESSIONS = ('gzip', 'zstd', None)
+
+COLUMNAR_COMPRESSION = 'zstd'
+
+_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow', 'ndjson': '.ndjson'}
+_COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', None: ''}
+
+# Inline records framed per chunk when the load step streams its outputs; Arrow
+# part files arrive in handoff.PART_BATCH_ROWS record batches instead
+JSON_CHUNK_ROWS = 10000
+
+OUTPUT_LAYOUTS = ('flat', 'partitioned')
+PARTITION_INDEX_DIR = '_index'
+# Rows per partition file before a partition is split into further parts
+DEFAULT_PART_ROWS = 1000000
+
+
+def output_extension(output_format: str, compression: Optional[str] = 'gzip') -> str:
+    """File extension for a format, including the compression suffix for NDJSON"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+    extension = _EXTENSIONS[output_format]
+    if output_format == 'ndjson':
+        extension += _COMPRESSION_EXTENSIONS[compression]
+    return extension
+
+
+class ResultWriter:
+    """
+    Writes DataFrame batches to one output file; use as a context manager or call close()
+
+    The file is created with the first non-empty batch, so a run without
+    results leaves no file behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write_batch(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        self._write(df)
+        self.rows += len(df)
+
+    def _write(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class CsvResultWriter(ResultWriter):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = None
+
+    def _write(self, df: pd.DataFrame) -> None:
+        # Header with the first batch only
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='')
+        df.to_csv(self._file, index=False, header=self.rows == 0)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class _ArrowResultWriter(ResultWriter):
+    """Shared batch-to-Arrow conversion for the Parquet and Arrow IPC writers"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._writer = None
+        self._schema = None
+
+    def _write(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema.remove_metadata()
+            self._writer = self._open(self._schema)
+        self._writer.write_table(table.cast(self._schema))
+
+    def _open(self, schema):
+        raise NotImplementedError
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ParquetResultWriter(_ArrowResultWriter):
+    def _open(self, schema):
+        import pyarrow.parquet as pq
+
+        # Categoricals arrive as Arrow dictionaries and stay dictionary-encoded in the file
+        return pq.ParquetWriter(self.path, schema, compression=COLUMNAR_COMPRESSION, use_dictionary=True)
+
+
+class ArrowResultWriter(_ArrowResultWriter):
+    def _open(self, schema):
+        import pyarrow as pa
+
+        options = pa.ipc.IpcWriteOptions(compression=COLUMNAR_COMPRESSION)
+        return pa.ipc.new_file(self.path, schema, options=options)
+
+
+class NdjsonResultWriter(ResultWriter):
+    def __init__(self, path: str, compression: Optional[str] = 'gzip'):
+        super().__init__(path)
+        if compression not in NDJSON_COMPRESSIONS:
+            raise ValueError(f"Unknown NDJSON compression {compression!r}, expected one of {NDJSON_COMPRESSIONS}")
+        self.compression = compression
+        self._file = None
+
+    def _write(self, df: pd.DataFrame) -> None:
+        if self._file is None:
+            self._file = open_compressed(self.path, self.compression)
+        lines = df.to_json(orient='records', lines=True)
+        if not lines.endswith('\n'):
+            lines += '\n'
+        self._file.write(lines.encode('utf-8'))
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def open_compressed(path: str, compression: Optional[str]):
+    """Open path for binary writing through gzip, zstd or no compression"""
+    if compression == 'gzip':
+        # Level 6 trades a little size for much faster writes than the default 9
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == 'zstd':
+        import pyarrow as pa
+
+        return pa.CompressedOutputStream(path, 'zstd')
+    if compression is None:
+        return open(path, 'wb')
+    raise ValueError(f"Unknown compression {compression!r}, expected one of {NDJSON_COMPRESSIONS}")
+
+
+class JsonDocumentWriter:
+    """
+    Streams one compact JSON object: scalar header fields first, then record arrays
+
+        with JsonDocumentWriter(path, compression='zstd') as writer:
+            writer.write_fields({'batch_id': ..., 'statistics': {...}})
+            writer.write_array('successful_results', chunks_of_records)
+
+    Records are serialized one chunk at a time, so at most one chunk of text is
+    held in memory; the caller decides the chunk size.
+    """
+
+    def __init__(self, path: str, compression: Optional[str] = None):
+        self.path = path
+        self._file = open_compressed(path, compression)
+        self._file.write(b'{')
+        self._first_field = True
+
+    def __enter__(self) -> 'JsonDocumentWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _key(self, name: str) -> None:
+        prefix = '' if self._first_field else ','
+        self._file.write(f'{prefix}{json.dumps(name)}:'.encode('utf-8'))
+        self._first_field = False
+
+    def write_fields(self, fields: Dict[str, Any]) -> None:
+        for name, value in fields.items():
+            self._key(name)
+            self._file.write(json.dumps(value, separators=(',', ':'), default=str).encode('utf-8'))
+
+    def write_array(self, name: str, chunks: Iterable[List[Dict]]) -> int:
+        """Write an array field from chunks of records and return the number of records"""
+        self._key(name)
+        self._file.write(b'[')
+        count = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            text = json.dumps(chunk, separators=(',', ':'), default=str)
+            # Splice the chunk's elements into the open array
+            self._file.write(((',' if count else '') + text[1:-1]).encode('utf-8'))
+            count += len(chunk)
+        self._file.write(b']')
+        return count
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.write(b'}\n')
+            self._file.close()
+            self._file = None
+
+
+def json_extension(compression: Optional[str] = None) -> str:
+    """File extension for the results JSON document, e.g. '.json.zst'"""
+    return '.json' + _COMPRESSION_EXTENSIONS[compression]
+
+
+def open_result_writer(path: str, output_format: str = 'csv',
+                       compression: Optional[str] = 'gzip') -> ResultWriter:
+    """
+    Open a writer for path in the given output format
+
+    compression only applies to NDJSON (gzip, zstd or None); Parquet and Arrow
+    always use zstd.
+    """
+    if output_format == 'csv':
+        return CsvResultWriter(path)
+    if output_format == 'parquet':
+        return ParquetResultWriter(path)
+    if output_format == 'arrow':
+        return ArrowResultWriter(path)
+    if output_format == 'ndjson':
+        return NdjsonResultWriter(path, compression)
+    raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+
+
+def run_token(run_id: str) -> str:
+    """
+    File-name-safe token for a run_id, stable across retries of the run
+
+    Characters outside [A-Za-z0-9_.-] become '_'; a short hash of the original
+    run_id is appended in that case so distinct run_ids cannot collide.
+    """
+    token = re.sub(r'[^A-Za-z0-9_.-]+', '_', run_id)
+    if token != run_id:
+        token += '-' + hashlib.sha1(run_id.encode('utf-8')).hexdigest()[:8]
+    return token
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """
+    Yield a temporary path to write instead of path, then commit it atomically
+
+    On success the temporary file is fsynced and renamed over path, and the
+    directory is fsynced so the rename survives a crash. On error it is
+    removed and path is left untouched. Writing nothing leaves path as it was.
+    """
+    tmp_path = _temp_path(path)
+    try:
+        yield tmp_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if os.path.exists(tmp_path):
+        _commit(tmp_path, path)
+
+
+def _temp_path(path: str) -> str:
+    """Hidden temporary path next to path, so the final rename stays on one filesystem"""
+    return os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp-{os.getpid()}')
+
+
+def _commit(tmp_path: str, path: str) -> None:
+    _fsync(tmp_path)
+    os.replace(tmp_path, path)
+    _fsync(os.path.dirname(path) or '.')
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def partition_dir(category: str, date: str) -> str:
+    """Relative directory of one partition, e.g. 'category=4K/date=2024-01-01'"""
+    return os.path.join(f'category={category}', f'date={date}')
+
+
+class PartitionedResultWriter:
+    """
+    Streams DataFrame batches under root partitioned by resolution_category and date
+
+        with PartitionedResultWriter(root, '2024-01-01', token, 'parquet') as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        parts = writer.parts
+
+    Files are named part-<N>-<run_token><ext>, N counting from 0 within each
+    partition, so runs sharing a date never overwrite each other's parts while
+    a retried run replaces its own. One part per partition is open at a time
+    and rolls over after max_rows_per_part rows. Each file is written to a
+    temporary path and committed atomically when it is full or the writer is
+    closed; on error every uncommitted part is removed. Partition columns stay
+    in the files as well.
+
+    After close, parts lists one entry per written file: category, date,
+    relative path, rows and bytes.
+    """
+
+    def __init__(self, root: str, date: str, run_token: str, output_format: str = 'csv',
+                 compression: Optional[str] = 'gzip', max_rows_per_part: int = DEFAULT_PART_ROWS):
+        self.root = root
+        self.date = date
+        self.run_token = run_token
+        self.output_format = output_format
+        self.compression = compression
+        self.max_rows_per_part = max_rows_per_part
+        self.extension = output_extension(output_format, compression)
+        self.parts: List[Dict] = []
+        # category -> (relative path, temporary path, writer) of its open part
+        self._open: Dict[str, Tuple[str, str, ResultWriter]] = {}
+        self._part_counts: Dict[str, int] = {}
+
+    def __enter__(self) -> 'PartitionedResultWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_batch(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        for category, group in df.groupby('resolution_category', observed=True, sort=True):
+            category = str(category)
+            start = 0
+            while start < len(group):
+                if category not in self._open:
+                    self._open_part(category)
+                writer = self._open[category][2]
+                rows = min(len(group) - start, self.max_rows_per_part - writer.rows)
+                writer.write_batch(group.iloc[start:start + rows])
+                start += rows
+                if writer.rows >= self.max_rows_per_part:
+                    self._commit_part(category)
+
+    def _open_part(self, category: str) -> None:
+        relative_dir = partition_dir(category, self.date)
+        os.makedirs(os.path.join(self.root, relative_dir), exist_ok=True)
+        part_number = self._part_counts.get(category, 0)
+        self._part_counts[category] = part_number + 1
+        relative_path = os.path.join(relative_dir, f'part-{part_number:05d}-{self.run_token}{self.extension}')
+        tmp_path = _temp_path(os.path.join(self.root, relative_path))
+        self._open[category] = (relative_path, tmp_path,
+                                open_result_writer(tmp_path, self.output_format, self.compression))
+
+    def _commit_part(self, category: str) -> None:
+        relative_path, tmp_path, writer = self._open.pop(category)
+        writer.close()
+        path = os.path.join(self.root, relative_path)
+        _commit(tmp_path, path)
+        self.parts.append({
+            'category': category,
+            'date': self.date,
+            'path': relative_path,
+            'rows': writer.rows,
+            'bytes': os.path.getsize(path),
+        })
+
+    def close(self) -> None:
+        """Commit every open part"""
+        for category in list(self._open):
+            self._commit_part(category)
+        self.parts.sort(key=lambda part: part['path'])
+
+    def abort(self) -> None:
+        """Discard every uncommitted part"""
+        for _, tmp_path, writer in self._open.values():
+            writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._open.clear()
+
+
+def write_partition_index(root: str, run_token: str, index: Dict) -> str:
+    """
+    Atomically write a run's partition index to <root>/_index/<run_token>.json
+
+    The index is written after the parts it lists and so marks the run's
+    partitioned output as complete. Returns the index path.
+    """
+    index_dir = os.path.join(root, PARTITION_INDEX_DIR)
+    os.makedirs(index_dir, exist_ok=True)
+    path = os.path.join(index_dir, f'{run_token}.json')
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2)
+    return path
+
+
+def remove_stale_parts(root: str, run_token: str, parts: List[Dict]) -> int:
+    """
+    Delete part files of run_token not listed in parts and return how many
+
+    A retry that writes fewer parts than an earlier attempt (e.g. a category
+    that disappeared) would otherwise leave the earlier attempt's extra parts.
+    """
+    keep = {os.path.normpath(part['path']) for part in parts}
+    # Match the exact token and a known extension, whatever format the earlier attempt used
+    run_suffixes = {run_token + extension for extension in _EXTENSIONS.values()}
+    run_suffixes |= {run_token + '.ndjson' + suffix for suffix in _COMPRESSION_EXTENSIONS.values()}
+
+    removed = 0
+    for path in glob.glob(os.path.join(glob.escape(root), 'category=*', 'date=*', 'part-*')):
+        match = re.fullmatch(r'part-\d+-(.+)', os.path.basename(path))
+        if not match or match.group(1) not in run_suffixes:
+            continue
+        if os.path.normpath(os.path.relpath(path, root)) not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
@@ -0,0 +1,323 @@
+"""
+Header-only image dimension probing
+
+Reads just enough of a file's header to find its width and height, without
+loading PIL plugins or building an Image object. Supports JPEG (SOF markers),
+PNG (IHDR), BMP, TIFF (first IFD) and WebP (VP8/VP8L/VP8X). Anything that
+cannot be parsed returns None so callers can fall back to PIL.
+
+For metered storage, probe_with_budget caps the bytes read per image: it reads
+a small head block, escalates block by block only while the header is
+incomplete (e.g. JPEGs with large EXIF/APP segments before the frame header),
+and reports how many bytes it read.
+"""
+
+import io
+import struct
+from typing import BinaryIO, Callable, Optional, Tuple
+
+from PIL import Image
+
+# Bytes read up front; enough for every supported header except JPEGs with
+# large APP segments and TIFFs whose first IFD is stored at the end of the file
+HEADER_BYTES = 4096
+
+# Default per-image byte budget for probe_with_budget; room for a JPEG's EXIF,
+# ICC profile and XMP segments, of which only the next marker's block is read
+DEFAULT_BYTE_BUDGET = 256 * 1024
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Start-of-frame markers carrying the frame dimensions (excludes DHT, JPG and DAC)
+JPEG_SOF_MARKERS = frozenset(
+    {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+)
+
+TIFF_TAG_WIDTH = 256
+TIFF_TAG_HEIGHT = 257
+TIFF_TYPE_SHORT = 3
+TIFF_TYPE_LONG = 4
+
+
+class ProbeBudgetExceeded(Exception):
+    """Raised when probing a file would read past its byte budget"""
+
+
+class CountingFile(io.RawIOBase):
+    """
+    Read-only file wrapper counting the bytes read and enforcing an optional budget
+
+    Wrap an unbuffered file (open(path, 'rb', buffering=0)): a buffered reader
+    would fetch whole st_blksize chunks from storage beneath the count. Every
+    byte returned by the underlying file is counted, and no read asks it for
+    more than one byte past the budget.
+    """
+
+    def __init__(self, f: BinaryIO, max_bytes: Optional[int] = None):
+        self._f = f
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._f.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = None
+        if self.max_bytes is not None:
+            remaining = self.max_bytes - self.bytes_read
+            if size is None or size > remaining:
+                # One byte past the budget tells a read that fits at EOF from one that does not
+                size = remaining + 1
+        if size is None:
+            data = self._f.read()
+        else:
+            data = self._read_full(size)
+        self.bytes_read += len(data)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise ProbeBudgetExceeded(f"probe budget of {self.max_bytes} bytes exceeded")
+        return data
+
+    def _read_full(self, size: int) -> bytes:
+        # Raw reads may return short; keep reading until size bytes or EOF
+        chunks = []
+        while size > 0:
+            chunk = self._f.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class HeaderReader:
+    """
+    Random-access reader over a file's header blocks
+
+    The head block is read up front; reads past it fetch and cache further
+    blocks of the same size, so parsers that hop between nearby offsets (JPEG
+    segment markers, TIFF IFD entries) touch each block at most once.
+    """
+
+    def __init__(self, f: BinaryIO, head_bytes: int = HEADER_BYTES):
+        self._f = f
+        self.block_bytes = head_bytes
+        self.head = f.read(head_bytes)
+        self._blocks = {0: self.head}
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read up to size bytes at offset, touching the file only for blocks not read yet"""
+        end = offset + size
+        if end <= len(self.head):
+            return self.head[offset:end]
+        if len(self.head) < self.block_bytes:
+            # The whole file fit in the head block
+            return self.head[offset:end]
+
+        first_block = offset // self.block_bytes
+        last_block = (end - 1) // self.block_bytes
+        data = b''.join(self._block(index) for index in range(first_block, last_block + 1))
+        start = offset - first_block * self.block_bytes
+        return data[start:start + size]
+
+    def _block(self, index: int) -> bytes:
+        block = self._blocks.get(index)
+        if block is None:
+            self._f.seek(index * self.block_bytes)
+            block = self._f.read(self.block_bytes)
+            self._blocks[index] = block
+        return block
+
+
+def _probe_png(reader: HeaderReader) -> Optional[Tuple[int, int]]:
+    header = reader.read_at(0, 24)
+    if len(header) < 24 or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def _probe_bmp(reader: HeaderReader) -> Optional[Tuple[int, int]]:
+    header = reader.read_at(0, 26)
+    if len(header) < 26:
+        return None
+    dib_size = struct.unpack('<I', header[14:18])[0]
+    if dib_size == 12:
+        # BITMAPCOREHEADER stores unsigned 16-bit dimensions
+        return struct.unpack('<HH', header[18:22])
+    if dib_size >= 40:
+        # BITMAPINFOHEADER and later; a negative height means a top-down bitmap
+        width, height = struct.unpack('<ii', header[18:26])
+        return width, abs(height)
+    return None
+
+
+def _probe_jpeg(reader: HeaderReader) -> Optional[Tuple[int, int]]:
+    offset = 2
+    while True:
+        segment = reader.read_at(offset, 4)
+        if len(segment) < 2 or segment[0] != 0xFF:
+            return None
+        marker = segment[1]
+        if marker == 0xFF:
+            # Fill byte before the actual marker
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Standalone markers without a length field
+            offset += 2
+            continue
+        if marker in (0xD9, 0xDA) or len(segment) < 4:
+            # End of image or start of scan before any frame header
+            return None
+        length = struct.unpack('>H', segment[2:4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = reader.read_at(offset + 4, 5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        if length < 2:
+            return None
+        offset += 2 + length
+
+
+def _probe_tiff(reader: HeaderReader) -> Optional[Tuple[int, int]]:
+    header = reader.read_at(0, 8)
+    if len(header) < 8:
+        return None
+    endian = '<' if header[:2] == b'II' else '>'
+    ifd_offset = struct.unpack(endian + 'I', header[4:8])[0]
+
+    count_bytes = reader.read_at(ifd_offset, 2)
+    if len(count_bytes) < 2:
+        return None
+    entry_count = struct.unpack(endian + 'H', count_bytes)[0]
+    entries = reader.read_at(ifd_offset + 2, entry_count * 12)
+
+    width = height = None
+    for start in range(0, len(entries) - 11, 12):
+        tag, field_type = struct.unpack(endian + 'HH', entries[start:start + 4])
+        if tag not in (TIFF_TAG_WIDTH, TIFF_TAG_HEIGHT):
+            continue
+        value = entries[start + 8:start + 12]
+        if field_type == TIFF_TYPE_SHORT:
+            dimension = struct.unpack(endian + 'H', value[:2])[0]
+        elif field_type == TIFF_TYPE_LONG:
+            dimension = struct.unpack(endian + 'I', value)[0]
+        else:
+            continue
+        if tag == TIFF_TAG_WIDTH:
+            width = dimension
+        else:
+            height = dimension
+
+    if width is None or height is None:
+        return None
+    return width, height
+
+
+def _probe_webp(reader: HeaderReader) -> Optional[Tuple[int, int]]:
+    header = reader.read_at(0, 30)
+    if len(header) < 30:
+        return None
+    chunk = header[12:16]
+    if chunk == b'VP8 ':
+        # Lossy: 14-bit dimensions after the 3-byte frame tag and start code
+        if header[23:26] != b'\x9d\x01\x2a':
+            return None
+        width, height = struct.unpack('<HH', header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        # Lossless: 14-bit (value - 1) dimensions packed after the signature byte
+        if header[20] != 0x2F:
+            return None
+        bits = struct.unpack('<I', header[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        # Extended: 24-bit (value - 1) canvas dimensions
+        width = int.from_bytes(header[24:27], 'little') + 1
+        height = int.from_bytes(header[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def _select_parser(head: bytes) -> Optional[Callable[[HeaderReader], Optional[Tuple[int, int]]]]:
+    """Pick a header parser from the file's magic bytes"""
+    if head[:3] == b'\xff\xd8\xff':
+        return _probe_jpeg
+    if head[:8] == PNG_SIGNATURE:
+        return _probe_png
+    if head[:2] == b'BM':
+        return _probe_bmp
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return _probe_tiff
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return _probe_webp
+    return None
+
+
+def probe_reader(reader: HeaderReader) -> Optional[Tuple[int, int]]:
+    """Probe dimensions through an open HeaderReader, returning None if unparseable"""
+    parser = _select_parser(reader.head)
+    if parser is None:
+        return None
+
+    try:
+        size = parser(reader)
+    except struct.error:
+        return None
+
+    if size is None or size[0] <= 0 or size[1] <= 0:
+        return None
+    return int(size[0]), int(size[1])
+
+
+def probe_dimensions(image_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from the image header without decoding the image
+
+    Returns None when the format is unsupported or the header cannot be parsed.
+    OSError from opening or reading the file is left to the caller.
+    """
+    with open(image_path, 'rb') as f:
+        return probe_reader(HeaderReader(f))
+
+
+def probe_with_budget(image_path: str, head_bytes: int = HEADER_BYTES,
+                      max_bytes: int = DEFAULT_BYTE_BUDGET) -> Tuple[Optional[Tuple[int, int]], int]:
+    """
+    Read (width, height) while reading at most max_bytes of the file
+
+    The header parsers run first; formats they cannot parse go through PIL,
+    which reads through the same budget. The file is opened unbuffered and no
+    read goes more than one byte past max_bytes. Returns the dimensions (None if they
+    could not be determined within the budget) and the bytes actually read.
+    OSError from opening the file is left to the caller.
+    """
+    # Unbuffered, so the count is what is actually read from storage
+    with open(image_path, 'rb', buffering=0) as f:
+        counted = CountingFile(f, max_bytes)
+        try:
+            size = probe_reader(HeaderReader(counted, min(head_bytes, max_bytes)))
+            if size is None:
+                counted.seek(0)
+                with Image.open(counted) as img:
+                    size = img.size
+        except Exception:
+            # Over budget (ProbeBudgetExceeded) or not an image PIL can identify
+            size = None
+        return size, counted.bytes_read
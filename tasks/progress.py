@@ -0,0 +1,68 @@
+"""
+Aggregated progress logging
+
+At millions of images, one INFO line per image costs more in formatting and
+log shipping than the classification itself. ProgressLogger instead emits one
+summary line (images, failures, overall and recent images/sec) every
+every_seconds and/or every_images, plus a final one from finish().
+"""
+
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVERY_SECONDS = 30.0
+
+
+class ProgressLogger:
+    """Counts processed and failed images and periodically logs the aggregate at INFO"""
+
+    def __init__(self, every_seconds: Optional[float] = DEFAULT_EVERY_SECONDS,
+                 every_images: Optional[int] = None, label: str = 'Classification',
+                 log: Optional[logging.Logger] = None):
+        self.every_seconds = every_seconds
+        self.every_images = every_images
+        self.label = label
+        self.processed = 0
+        self.failed = 0
+        self._log = log or logger
+        self._start = self._last_time = time.monotonic()
+        self._last_total = 0
+
+    @property
+    def total(self) -> int:
+        return self.processed + self.failed
+
+    def update(self, processed: int = 0, failed: int = 0) -> None:
+        """Add to the counts, logging a progress line if an interval has elapsed"""
+        self.processed += processed
+        self.failed += failed
+
+        if self.every_images and self.total - self._last_total >= self.every_images:
+            self._report(time.monotonic())
+        elif self.every_seconds is not None:
+            now = time.monotonic()
+            if now - self._last_time >= self.every_seconds:
+                self._report(now)
+
+    def finish(self) -> None:
+        """Log the final totals"""
+        elapsed = time.monotonic() - self._start
+        self._log.info(
+            "%s finished: %d images, %d failed in %.1fs (%.1f images/sec)",
+            self.label, self.processed, self.failed, elapsed, self.total / elapsed if elapsed > 0 else 0.0
+        )
+
+    def _report(self, now: float) -> None:
+        elapsed = now - self._start
+        interval = now - self._last_time
+        self._log.info(
+            "%s progress: %d images, %d failed in %.1fs (%.1f images/sec overall, %.1f recent)",
+            self.label, self.processed, self.failed, elapsed,
+            self.total / elapsed if elapsed > 0 else 0.0,
+            (self.total - self._last_total) / interval if interval > 0 else 0.0
+        )
+        self._last_time = now
+        self._last_total = self.total
@@ -0,0 +1,164 @@
+"""
+Compact columnar store for classification results
+
+A result dict per image (nine keys plus a freshly formatted timestamp) costs
+around 1 KB. RecordStore instead appends each image to parallel typed arrays
+(width, height, file size and optionally probe bytes read), keeps the scanner's
+filename strings as they are and stamps the whole batch with one timestamp.
+Derived columns (pixel count, aspect ratio, size in MB, category code) are
+computed in vectorized passes when the store is converted to a DataFrame or an
+Arrow table, so an image costs its filename plus a few tens of bytes.
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+BYTES_PER_MB = 1024 * 1024
+
+# Largest width or height the int32 columns hold; TIFF LONG tags can declare more
+MAX_DIMENSION = 2 ** 31 - 1
+
+
+class RecordStore:
+    """Append-only columnar batch of classified images"""
+
+    def __init__(self, categories: Sequence[str], thresholds: np.ndarray,
+                 track_bytes_read: bool = False, processed_at: Optional[str] = None):
+        """
+        Args:
+            categories: Resolution categories ordered by pixel count
+            thresholds: Upper pixel bound of every category but the last
+            track_bytes_read: Whether to keep a probe_bytes_read column
+            processed_at: Timestamp shared by the batch; defaults to now
+        """
+        self.categories = list(categories)
+        self.thresholds = thresholds
+        self.processed_at = processed_at or datetime.now().isoformat()
+        self.filenames: List[str] = []
+        self._widths = array('i')
+        self._heights = array('i')
+        self._sizes = array('q')
+        self._bytes_read = array('q') if track_bytes_read else None
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def append(self, filename: str, width: int, height: int, file_size: int,
+               bytes_read: Optional[int] = None) -> None:
+        self.filenames.append(filename)
+        self._widths.append(width)
+        self._heights.append(height)
+        self._sizes.append(file_size)
+        if self._bytes_read is not None:
+            self._bytes_read.append(bytes_read or 0)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the typed columns (filenames excluded)"""
+        arrays = [self._widths, self._heights, self._sizes]
+        if self._bytes_read is not None:
+            arrays.append(self._bytes_read)
+        return sum(a.itemsize * len(a) for a in arrays) + 8 * len(self.filenames)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        Typed column arrays, the category as int8 codes into self.categories
+
+        Width, height, size and bytes-read arrays are views of the store's
+        buffers, so the store cannot grow while they are alive.
+        """
+        widths = _view(self._widths, np.int32)
+        heights = _view(self._heights, np.int32)
+        sizes = _view(self._sizes, np.int64)
+        total_pixels = widths.astype(np.int64) * heights
+
+        columns = {
+            'width': widths,
+            'height': heights,
+            # A category covers pixel counts up to and including its own threshold
+            'category_code': np.searchsorted(self.thresholds, total_pixels, side='left').astype(np.int8),
+            'total_pixels': total_pixels,
+            'aspect_ratio': round_like_python(widths / heights, 2),
+            'file_size_bytes': sizes,
+            'file_size_mb': round_like_python(sizes / BYTES_PER_MB, 2),
+        }
+        if self._bytes_read is not None:
+            columns['probe_bytes_read'] = _view(self._bytes_read, np.int64)
+        return columns
+
+    def to_frame(self) -> pd.DataFrame:
+        """Results as a DataFrame with the classifier's column order"""
+        if not self.filenames:
+            return pd.DataFrame()
+
+        columns = self.columns()
+        frame = {
+            'filename': self.filenames,
+            'width': columns['width'],
+            'height': columns['height'],
+            'resolution_category': pd.Categorical.from_codes(
+                columns['category_code'], categories=self.categories, ordered=True
+            ),
+            'total_pixels': columns['total_pixels'],
+            'aspect_ratio': columns['aspect_ratio'],
+            'file_size_bytes': columns['file_size_bytes'],
+            'file_size_mb': columns['file_size_mb'],
+            'processed_at': [self.processed_at] * len(self.filenames),
+        }
+        if 'probe_bytes_read' in columns:
+            frame['probe_bytes_read'] = columns['probe_bytes_read']
+        return pd.DataFrame(frame)
+
+    def to_arrow(self):
+        """Results as a pyarrow Table, the category dictionary-encoded"""
+        import pyarrow as pa
+
+        columns = self.columns()
+        table = {
+            'filename': pa.array(self.filenames, type=pa.string()),
+            'width': pa.array(columns['width']),
+            'height': pa.array(columns['height']),
+            'resolution_category': pa.DictionaryArray.from_arrays(
+                pa.array(columns['category_code']), pa.array(self.categories, type=pa.string())
+            ),
+            'total_pixels': pa.array(columns['total_pixels']),
+            'aspect_ratio': pa.array(columns['aspect_ratio']),
+            'file_size_bytes': pa.array(columns['file_size_bytes']),
+            'file_size_mb': pa.array(columns['file_size_mb']),
+            'processed_at': pa.array([self.processed_at] * len(self.filenames), type=pa.string()),
+        }
+        if 'probe_bytes_read' in columns:
+            table['probe_bytes_read'] = pa.array(columns['probe_bytes_read'])
+        return pa.table(table)
+
+
+def valid_dimensions(width: int, height: int) -> bool:
+    """Whether width and height are positive and fit the store's int32 columns"""
+    return 0 < width <= MAX_DIMENSION and 0 < height <= MAX_DIMENSION
+
+
+def round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Vectorized round() that matches Python's round(value, ndigits) exactly
+
+    np.round scales by 10**ndigits and rounds, which can land on the wrong side
+    of a value lying within float error of a tie. Those few values are rounded
+    with Python's correctly rounded round() instead.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    distance_to_tie = np.abs(scaled - np.floor(scaled) - 0.5)
+    near_tie = distance_to_tie <= np.maximum(np.abs(np.spacing(scaled)) * 4, 1e-9)
+    if near_tie.any():
+        rounded[near_tie] = [round(float(value), ndigits) for value in values[near_tie]]
+    return rounded
+
+
+def _view(values: array, dtype) -> np.ndarray:
+    # Zero-copy view of the array's buffer; frombuffer rejects empty buffers on older NumPy
+    if not values:
+        return np.empty(0, dtype)
+    return np.frombuffer(values, dtype=dtype)
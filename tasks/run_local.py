@@ -0,0 +1,236 @@
+"""
+Local process-pool runner for large classification backfills
+
+Classifies images from one or more input folders, or from a manifest, without
+Airflow. The image paths are cut into shards that are classified in parallel
+on a process pool sized to the machine's CPU count; every shard writes its own
+CSV part and statistics, which are then merged into a single results CSV and a
+statistics JSON file. Shards are submitted lazily with a bounded number in
+flight, so tens of millions of paths never have to be held in memory at once.
+
+Usage:
+    python run_local.py /archive/2019 /archive/2020 --output backfill.csv
+    python run_local.py --manifest paths.txt.gz --output backfill.csv --workers 16
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from cache import ClassificationCache
+from classify import ImageClassifier
+from scanner import ImageEntry, ImagePath, list_images, stat_image
+from stats import RunningStatistics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 5000
+
+
+def iter_manifest_paths(manifest_path: str) -> Iterator[str]:
+    """
+    Yield image paths from a manifest
+
+    Arrow IPC extract manifests (.arrow) are read through their file_path
+    column; anything else is treated as newline-delimited paths, optionally
+    gzip-compressed (.gz).
+    """
+    if manifest_path.endswith('.arrow'):
+        import pyarrow as pa
+
+        reader = pa.ipc.open_file(pa.memory_map(manifest_path, 'r'))
+        for index in range(reader.num_record_batches):
+            yield from reader.get_batch(index).column('file_path').to_pylist()
+        return
+
+    opener = gzip.open if manifest_path.endswith('.gz') else open
+    with opener(manifest_path, 'rt') as f:
+        for line in f:
+            path = line.strip()
+            if path:
+                yield path
+
+
+def iter_input_paths(input_folders: Iterable[str], manifest_path: Optional[str] = None,
+                     **list_options) -> Iterator[str]:
+    """
+    Yield image paths from every input folder, then from the manifest if one is given
+
+    Folders are only listed here; the workers stat each image once when they
+    classify it, so the parent never waits on per-file stat calls.
+    """
+    for input_folder in input_folders:
+        if not os.path.exists(input_folder):
+            logger.error(f"Input folder {input_folder} does not exist")
+            continue
+        for image in list_images(input_folder, **list_options):
+            yield image.path
+
+    if manifest_path:
+        yield from iter_manifest_paths(manifest_path)
+
+
+def _shard_entries(image_paths: List[str], min_size: Optional[int] = None,
+                   max_size: Optional[int] = None) -> Iterator[ImageEntry]:
+    # Full paths as filenames keep results from different folders distinguishable
+    for image_path in image_paths:
+        try:
+            entry = stat_image(ImagePath(image_path, image_path), min_size, max_size)
+        except OSError as e:
+            logger.error(f"Error reading image {image_path}: {e}")
+            continue
+        if entry is not None:
+            yield entry
+
+
+def classify_shard(shard_index: int, image_paths: List[str], parts_dir: str,
+                   cache_path: Optional[str] = None, min_size: Optional[int] = None,
+                   max_size: Optional[int] = None) -> Dict:
+    """Classify one shard in a worker process and write its results to a CSV part"""
+    cache = ClassificationCache(cache_path) if cache_path else None
+    try:
+        classifier = ImageClassifier(cache=cache)
+        df = classifier.classify_entries(_shard_entries(image_paths, min_size, max_size))
+    finally:
+        if cache is not None:
+            cache.close()
+
+    stats = RunningStatistics()
+    stats.update_frame(df)
+
+    part_path = os.path.join(parts_dir, f"part-{shard_index:06d}.csv")
+    df.to_csv(part_path, index=False)
+
+    return {
+        'shard': shard_index,
+        'part_path': part_path if not df.empty else None,
+        'submitted': len(image_paths),
+        'statistics': stats.to_state(),
+        'cache_stats': cache.stats() if cache is not None else None
+    }
+
+
+def merge_parts(part_paths: List[str], output_file: str) -> None:
+    """Concatenate CSV parts in order into output_file, keeping only the first header"""
+    with open(output_file, 'w', newline='') as output:
+        for index, part_path in enumerate(part_paths):
+            with open(part_path, newline='') as part:
+                header = part.readline()
+                if index == 0:
+                    output.write(header)
+                shutil.copyfileobj(part, output)
+
+
+def run_local(image_paths: Iterable[str], output_file: str, workers: Optional[int] = None,
+              shard_size: int = DEFAULT_SHARD_SIZE, cache_path: Optional[str] = None,
+              stats_file: Optional[str] = None, min_size: Optional[int] = None,
+              max_size: Optional[int] = None) -> Dict:
+    """
+    Classify image paths across a process pool and write merged results
+
+    Args:
+        image_paths: Image paths to classify; consumed lazily
+        output_file: Path of the merged results CSV
+        workers: Process count, defaulting to the machine's CPU count
+        shard_size: Images classified per shard
+        cache_path: Optional classification cache database shared by all workers
+        stats_file: Optional path for the merged statistics JSON
+        min_size: Skip images smaller than this many bytes
+        max_size: Skip images larger than this many bytes
+
+    Returns:
+        Dictionary containing the merged statistics and run counters
+    """
+    workers = workers or os.cpu_count() or 1
+    image_paths = iter(image_paths)
+    shards = iter(lambda: list(islice(image_paths, shard_size)), [])
+
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(output_dir, exist_ok=True)
+    parts_dir = tempfile.mkdtemp(prefix='classify_parts_', dir=output_dir)
+
+    merged_stats = RunningStatistics()
+    cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+    part_paths = {}
+    submitted = 0
+
+    logger.info(f"Classifying with {workers} worker processes, {shard_size} images per shard")
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            for shard_index, shard in enumerate(shards):
+                # Keep a bounded number of shards in flight so paths are consumed lazily
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _fold_shard(future.result(), merged_stats, cache_stats, part_paths)
+                in_flight.add(pool.submit(classify_shard, shard_index, shard, parts_dir,
+                                           cache_path, min_size, max_size))
+                submitted += len(shard)
+
+            for future in in_flight:
+                _fold_shard(future.result(), merged_stats, cache_stats, part_paths)
+
+        merge_parts([part_paths[index] for index in sorted(part_paths)], output_file)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    result = {
+        'status': 'success' if merged_stats.total_images else 'error',
+        'submitted_images': submitted,
+        'total_images': merged_stats.total_images,
+        'statistics': merged_stats.to_dict(),
+        'output_file': output_file
+    }
+    if cache_path:
+        result['cache_stats'] = cache_stats
+
+    if stats_file:
+        with open(stats_file, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    logger.info(f"Classified {merged_stats.total_images} of {submitted} images into {output_file}")
+    return result
+
+
+def _fold_shard(shard_result: Dict, merged_stats: RunningStatistics, cache_stats: Dict,
+                part_paths: Dict) -> None:
+    merged_stats.merge(RunningStatistics.from_state(shard_result['statistics']))
+    for counter, value in (shard_result['cache_stats'] or {}).items():
+        cache_stats[counter] += value
+    if shard_result['part_path']:
+        part_paths[shard_result['shard']] = shard_result['part_path']
+    logger.info(f"Shard {shard_result['shard']} done: {shard_result['submitted']} images")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify images by resolution on a local process pool")
+    parser.add_argument('input_folders', nargs='*', help="Folders containing images to classify")
+    parser.add_argument('--manifest', default=None,
+                        help="Image paths to classify: newline-delimited (optionally .gz) or an .arrow extract manifest")
+    parser.add_argument('--output', default="classification_results.csv", help="Path of the merged results CSV")
+    parser.add_argument('--stats', default=None, help="Path to save the merged statistics JSON")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help="Images per shard")
+    parser.add_argument('--cache', default=None, help="Classification cache database to reuse between runs")
+    parser.add_argument('--recursive', action='store_true', help="Also classify images in subfolders")
+    parser.add_argument('--min-size', type=int, default=None, help="Skip images smaller than this many bytes")
+    parser.add_argument('--max-size', type=int, default=None, help="Skip images larger than this many bytes")
+    args = parser.parse_args()
+
+    if not args.input_folders and not args.manifest:
+        parser.error("give at least one input folder or --manifest")
+
+    logging.basicConfig(level=logging.INFO)
+    paths = iter_input_paths(args.input_folders, args.manifest, recursive=args.recursive)
+    result = run_local(paths, args.output, workers=args.workers, shard_size=args.shard_size,
+                       cache_path=args.cache, stats_file=args.stats,
+                       min_size=args.min_size, max_size=args.max_size)
+    print(f"Classification result: {result}")
@@ -0,0 +1,164 @@
+"""
+Single-pass image discovery built on os.scandir
+
+scan_images walks a folder once, matching extensions against a frozenset of
+suffixes and reusing each DirEntry's stat result for size and mtime, so no
+separate os.path.getsize call is made per file. It optionally recurses into subfolders
+and filters by include/exclude globs and file size. Recursive scans follow
+symlinked folders but enter each directory once, and skip (with a warning)
+subfolders that cannot be listed.
+
+list_images is the listing half on its own: it yields names and paths without
+stat'ing, so latency-bound callers can run stat_image (one os.stat per path)
+concurrently.
+"""
+
+import fnmatch
+import logging
+import os
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'})
+
+
+class ImageEntry(NamedTuple):
+    """An image file found by a scan"""
+    name: str       # path relative to the scanned folder
+    path: str
+    size: int
+    mtime_ns: int
+
+
+class ImagePath(NamedTuple):
+    """An image file found by a listing, not stat'ed yet"""
+    name: str       # path relative to the listed folder
+    path: str
+
+
+def entry_for_path(path: str) -> ImageEntry:
+    """Build an ImageEntry for a single path; raises OSError if it cannot be stat'ed"""
+    stat = os.stat(path)
+    return ImageEntry(os.path.basename(path), path, stat.st_size, stat.st_mtime_ns)
+
+
+def _compile_globs(patterns: Optional[Iterable[str]]):
+    """Combine glob patterns into one compiled regex, or None when there are none"""
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+def _dir_key(path: str):
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino
+
+
+def _walk_images(folder: str, recursive: bool, include: Optional[Iterable[str]],
+                 exclude: Optional[Iterable[str]],
+                 extensions: frozenset) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Yield (relative name, DirEntry) for every matching image file under folder"""
+    include_re = _compile_globs(include)
+    exclude_re = _compile_globs(exclude)
+    prefix_len = len(os.path.join(folder, ''))
+    pending = [folder]
+    # Directories already queued, by (st_dev, st_ino): symlinked folders are
+    # followed, but a symlink loop (e.g. a/up -> ..) is never entered twice
+    visited = {_dir_key(folder)} if recursive else set()
+
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            if directory == folder:
+                raise
+            # One unreadable subfolder must not abort the whole scan
+            logger.warning("Skipping folder %s: %s", directory, e)
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if recursive:
+                        try:
+                            key = _dir_key(entry.path)
+                        except OSError as e:
+                            logger.warning("Skipping folder %s: %s", entry.path, e)
+                            continue
+                        if key not in visited:
+                            visited.add(key)
+                            pending.append(entry.path)
+                    continue
+
+                if os.path.splitext(entry.name)[1].lower() not in extensions:
+                    continue
+
+                name = entry.path[prefix_len:]
+                if include_re is not None and not include_re.match(name):
+                    continue
+                if exclude_re is not None and exclude_re.match(name):
+                    continue
+
+                yield name, entry
+
+
+def _sized_entry(name: str, path: str, stat: os.stat_result, min_size: Optional[int],
+                 max_size: Optional[int]) -> Optional[ImageEntry]:
+    if min_size is not None and stat.st_size < min_size:
+        return None
+    if max_size is not None and stat.st_size > max_size:
+        return None
+    return ImageEntry(name, path, stat.st_size, stat.st_mtime_ns)
+
+
+def list_images(folder: str, recursive: bool = False,
+                include: Optional[Iterable[str]] = None,
+                exclude: Optional[Iterable[str]] = None,
+                extensions: frozenset = IMAGE_EXTENSIONS) -> Iterator[ImagePath]:
+    """
+    Yield image files under folder without stat'ing them
+
+    Only directory entries are read, so callers on high-latency storage can
+    stat the files concurrently (see stat_image). Arguments as for scan_images.
+    """
+    for name, entry in _walk_images(folder, recursive, include, exclude, extensions):
+        yield ImagePath(name, entry.path)
+
+
+def stat_image(image: ImagePath, min_size: Optional[int] = None,
+               max_size: Optional[int] = None) -> Optional[ImageEntry]:
+    """Stat a listed image into an ImageEntry, or None if its size is out of bounds; raises OSError"""
+    return _sized_entry(image.name, image.path, os.stat(image.path), min_size, max_size)
+
+
+def scan_images(folder: str, recursive: bool = False,
+                include: Optional[Iterable[str]] = None,
+                exclude: Optional[Iterable[str]] = None,
+                min_size: Optional[int] = None,
+                max_size: Optional[int] = None,
+                extensions: frozenset = IMAGE_EXTENSIONS) -> Iterator[ImageEntry]:
+    """
+    Yield image files under folder in a single pass
+
+    Args:
+        folder: Folder to scan
+        recursive: Whether to descend into subfolders
+        include: Glob patterns; if given, a file's relative path must match one of them
+        exclude: Glob patterns; files whose relative path matches any of them are skipped
+        min_size: Skip files smaller than this many bytes
+        max_size: Skip files larger than this many bytes
+        extensions: Lower-case suffixes (with the dot) that mark image files
+    """
+    for name, dir_entry in _walk_images(folder, recursive, include, exclude, extensions):
+        try:
+            # DirEntry caches its stat, and on Windows fills it from the listing itself
+            stat = dir_entry.stat()
+        except OSError:
+            # Removed or unreadable between listing and stat
+            continue
+        entry = _sized_entry(name, dir_entry.path, stat, min_size, max_size)
+        if entry is not None:
+            yield entry
@@ -0,0 +1,239 @@
+"""
+Incremental statistics over classification results
+
+RunningStatistics folds records or result batches into fixed-size running
+totals so that statistics can be computed while streaming, without keeping
+every record in memory. Instances are mergeable and serialize to a small
+JSON-friendly state, so each mapped task can ship its partial statistics and
+the load step only has to merge one state per task. Its output matches
+ImageClassifier.generate_statistics.
+"""
+
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Log-scale histogram resolution for approximate quantiles: buckets per doubling.
+# Eight buckets bound the relative error of a reported quantile to about 4.5%.
+QUANTILE_BUCKETS_PER_OCTAVE = 8
+
+# Quantiles reported when quantile tracking is enabled
+REPORTED_QUANTILES = (0.5, 0.9, 0.99)
+
+# Record fields tracked by the quantile histograms
+QUANTILE_FIELDS = ('file_size_bytes', 'total_pixels')
+
+
+class RunningStatistics:
+    """Mergeable running counts, sums, extremes and optional quantile sketches"""
+
+    def __init__(self, quantiles: bool = False):
+        self.quantiles = quantiles
+        self.total_images = 0
+        self.category_counts: Dict[str, int] = {}
+        self.category_bytes: Dict[str, int] = {}
+        self.file_size_mb_sum = 0.0
+        self.aspect_ratio_sum = 0.0
+        self.width_sum = 0
+        self.height_sum = 0
+        self.min_width = None
+        self.min_height = None
+        self.max_width = None
+        self.max_height = None
+        self.histograms: Dict[str, Dict[int, int]] = {field: {} for field in QUANTILE_FIELDS}
+
+    def update(self, record: Dict) -> None:
+        """Fold a single classification result into the running totals"""
+        width = int(record['width'])
+        height = int(record['height'])
+        category = record['resolution_category']
+
+        self.total_images += 1
+        self.category_counts[category] = self.category_counts.get(category, 0) + 1
+        self.category_bytes[category] = self.category_bytes.get(category, 0) + int(record['file_size_bytes'])
+        self.file_size_mb_sum += record['file_size_mb']
+        self.aspect_ratio_sum += record['aspect_ratio']
+        self.width_sum += width
+        self.height_sum += height
+        self.min_width = _min(self.min_width, width)
+        self.min_height = _min(self.min_height, height)
+        self.max_width = _max(self.max_width, width)
+        self.max_height = _max(self.max_height, height)
+
+        if self.quantiles:
+            for field in QUANTILE_FIELDS:
+                bucket = _bucket(record[field])
+                histogram = self.histograms[field]
+                histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def update_frame(self, df: pd.DataFrame) -> None:
+        """Fold a batch of classification results into the running totals"""
+        if df.empty:
+            return
+
+        self.total_images += len(df)
+        # Counts and byte totals per category from one grouping pass
+        per_category = df['file_size_bytes'].groupby(
+            df['resolution_category'], observed=True, sort=False
+        ).agg(['size', 'sum'])
+        for category, count, size_bytes in zip(per_category.index, per_category['size'], per_category['sum']):
+            if count:
+                self.category_counts[category] = self.category_counts.get(category, 0) + int(count)
+                self.category_bytes[category] = self.category_bytes.get(category, 0) + int(size_bytes)
+
+        self.file_size_mb_sum += float(df['file_size_mb'].sum())
+        self.aspect_ratio_sum += float(df['aspect_ratio'].sum())
+        self.width_sum += int(df['width'].sum())
+        self.height_sum += int(df['height'].sum())
+        self.min_width = _min(self.min_width, int(df['width'].min()))
+        self.min_height = _min(self.min_height, int(df['height'].min()))
+        self.max_width = _max(self.max_width, int(df['width'].max()))
+        self.max_height = _max(self.max_height, int(df['height'].max()))
+
+        if self.quantiles:
+            for field in QUANTILE_FIELDS:
+                values = np.maximum(df[field].to_numpy(dtype=np.float64), 1.0)
+                buckets = np.floor(np.log2(values) * QUANTILE_BUCKETS_PER_OCTAVE).astype(np.int64)
+                histogram = self.histograms[field]
+                for bucket, count in zip(*np.unique(buckets, return_counts=True)):
+                    histogram[int(bucket)] = histogram.get(int(bucket), 0) + int(count)
+
+    def merge(self, other: 'RunningStatistics') -> 'RunningStatistics':
+        """Fold another instance's totals into this one and return self"""
+        self.total_images += other.total_images
+        for category, count in other.category_counts.items():
+            self.category_counts[category] = self.category_counts.get(category, 0) + count
+        for category, size_bytes in other.category_bytes.items():
+            self.category_bytes[category] = self.category_bytes.get(category, 0) + size_bytes
+
+        self.file_size_mb_sum += other.file_size_mb_sum
+        self.aspect_ratio_sum += other.aspect_ratio_sum
+        self.width_sum += other.width_sum
+        self.height_sum += other.height_sum
+        self.min_width = _min(self.min_width, other.min_width)
+        self.min_height = _min(self.min_height, other.min_height)
+        self.max_width = _max(self.max_width, other.max_width)
+        self.max_height = _max(self.max_height, other.max_height)
+
+        if self.quantiles:
+            for field, other_histogram in other.histograms.items():
+                histogram = self.histograms[field]
+                for bucket, count in other_histogram.items():
+                    histogram[bucket] = histogram.get(bucket, 0) + count
+
+        return self
+
+    def to_state(self) -> Dict:
+        """Serialize the running totals to a JSON-friendly dict (e.g. for XCom)"""
+        state = {
+            'total_images': self.total_images,
+            'category_counts': dict(self.category_counts),
+            'category_bytes': dict(self.category_bytes),
+            'file_size_mb_sum': self.file_size_mb_sum,
+            'aspect_ratio_sum': self.aspect_ratio_sum,
+            'width_sum': self.width_sum,
+            'height_sum': self.height_sum,
+            'min_width': self.min_width,
+            'min_height': self.min_height,
+            'max_width': self.max_width,
+            'max_height': self.max_height,
+        }
+        if self.quantiles:
+            # JSON object keys must be strings
+            state['histograms'] = {
+                field: {str(bucket): count for bucket, count in histogram.items()}
+                for field, histogram in self.histograms.items()
+            }
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'RunningStatistics':
+        """Rebuild an instance from a dict produced by to_state"""
+        stats = cls(quantiles='histograms' in state)
+        stats.total_images = state['total_images']
+        stats.category_counts = dict(state['category_counts'])
+        stats.category_bytes = dict(state.get('category_bytes', {}))
+        stats.file_size_mb_sum = state['file_size_mb_sum']
+        stats.aspect_ratio_sum = state['aspect_ratio_sum']
+        stats.width_sum = state['width_sum']
+        stats.height_sum = state['height_sum']
+        stats.min_width = state['min_width']
+        stats.min_height = state['min_height']
+        stats.max_width = state['max_width']
+        stats.max_height = state['max_height']
+        for field, histogram in state.get('histograms', {}).items():
+            stats.histograms[field] = {int(bucket): count for bucket, count in histogram.items()}
+        return stats
+
+    def quantile(self, field: str, q: float) -> Optional[float]:
+        """Approximate the q-th quantile of a tracked field from its log-scale histogram"""
+        histogram = self.histograms.get(field)
+        if not histogram:
+            return None
+
+        rank = q * (sum(histogram.values()) - 1)
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen > rank:
+                # Geometric midpoint of the bucket's [lower, upper) range
+                return 2 ** ((bucket + 0.5) / QUANTILE_BUCKETS_PER_OCTAVE)
+        return None
+
+    def to_dict(self) -> Dict:
+        """Render the statistics in the same shape as ImageClassifier.generate_statistics"""
+        if not self.total_images:
+            return {}
+
+        count = self.total_images
+        distribution = sorted(self.category_counts.items(), key=lambda item: item[1], reverse=True)
+
+        stats = {
+            'total_images': count,
+            'resolution_distribution': dict(distribution),
+            'avg_file_size_mb': round(self.file_size_mb_sum / count, 2),
+            'total_size_mb': round(self.file_size_mb_sum, 2),
+            'avg_aspect_ratio': round(self.aspect_ratio_sum / count, 2),
+            'resolution_summary': {
+                'min_resolution': f"{self.min_width}x{self.min_height}",
+                'max_resolution': f"{self.max_width}x{self.max_height}",
+                'avg_resolution': f"{self.width_sum // count}x{self.height_sum // count}"
+            }
+        }
+
+        if self.quantiles:
+            stats['quantiles'] = {
+                'file_size_mb': {
+                    f"p{int(q * 100)}": round(self.quantile('file_size_bytes', q) / (1024 * 1024), 2)
+                    for q in REPORTED_QUANTILES
+                },
+                'total_pixels': {
+                    f"p{int(q * 100)}": int(self.quantile('total_pixels', q))
+                    for q in REPORTED_QUANTILES
+                },
+            }
+
+        return stats
+
+
+def _bucket(value: float) -> int:
+    """Log-scale histogram bucket for a positive value"""
+    return math.floor(math.log2(max(value, 1)) * QUANTILE_BUCKETS_PER_OCTAVE)
+
+
+def _min(current, value):
+    if current is None:
+        return value
+    if value is None:
+        return current
+    return min(current, value)
+
+
+def _max(current, value):
+    if current is None:
+        return value
+    if value is None:
+        return current
+    return max(current, value)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Task modules import each other as top-level modules, as on the Airflow workers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tasks'))
@@ -0,0 +1,188 @@
+"""
+Tests for cache validation, invalidation and eviction in tasks/cache.py
+
+Entries must only ever be served for an unchanged file: a different size or
+mtime invalidates them, unless hash_content shows the content is the same.
+Writes are queued and only reach the database on commit(), and eviction
+only looks at entries under the given root.
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+from cache import ClassificationCache
+
+
+def _image(tmp_path, name: str, data: bytes = b'\x89PNG' + b'\x00' * 60) -> str:
+    path = tmp_path / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def _signature(path: str):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _rows(db_path: str):
+    with sqlite3.connect(db_path) as conn:
+        return {path: (size, mtime_ns) for path, size, mtime_ns in
+                conn.execute('SELECT path, size, mtime_ns FROM classifications')}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with ClassificationCache(str(tmp_path / 'cache' / 'cache.sqlite')) as cache:
+        yield cache
+
+
+# --- validation and invalidation ---
+
+def test_hit_for_unchanged_file(cache, tmp_path):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    cache.store(path, size, mtime_ns, 640, 480, '480p')
+    cache.commit()
+
+    assert cache.lookup(path, size, mtime_ns) == {
+        'width': 640, 'height': 480, 'resolution_category': '480p', 'file_size_bytes': size
+    }
+    assert cache.stats() == {'hits': 1, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+
+@pytest.mark.parametrize('size_delta, mtime_delta', [(1, 0), (0, 1), (1, 1)])
+def test_changed_size_or_mtime_invalidates(cache, tmp_path, size_delta, mtime_delta):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    cache.store(path, size, mtime_ns, 640, 480, '480p')
+    cache.commit()
+
+    assert cache.lookup(path, size + size_delta, mtime_ns + mtime_delta) is None
+    # The invalidated entry is gone even for the old signature, and deleted on commit
+    assert cache.lookup(path, size, mtime_ns) is None
+    cache.commit()
+    assert _rows(cache.db_path) == {}
+    assert cache.invalidations == 1
+    assert cache.misses == 2
+
+
+def test_store_after_invalidation_replaces_entry(cache, tmp_path):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    cache.store(path, size, mtime_ns, 640, 480, '480p')
+    cache.commit()
+
+    assert cache.lookup(path, size, mtime_ns + 1) is None
+    cache.store(path, size, mtime_ns + 1, 1920, 1080, '1080p')
+    cache.commit()
+
+    assert _rows(cache.db_path) == {os.path.abspath(path): (size, mtime_ns + 1)}
+    assert cache.lookup(path, size, mtime_ns + 1)['resolution_category'] == '1080p'
+
+
+def test_hash_content_revalidates_touched_file(tmp_path):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    db_path = str(tmp_path / 'cache.sqlite')
+    with ClassificationCache(db_path, hash_content=True) as cache:
+        cache.store(path, size, mtime_ns, 640, 480, '480p')
+        cache.commit()
+
+        # Same content, new mtime: served, and the new mtime is persisted
+        assert cache.lookup(path, size, mtime_ns + 10)['width'] == 640
+        assert cache.invalidations == 0
+    assert _rows(db_path) == {os.path.abspath(path): (size, mtime_ns + 10)}
+
+
+def test_hash_content_invalidates_changed_content(tmp_path):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    with ClassificationCache(str(tmp_path / 'cache.sqlite'), hash_content=True) as cache:
+        cache.store(path, size, mtime_ns, 640, 480, '480p')
+        cache.commit()
+
+        _image(tmp_path, 'a.png', b'\x89PNG' + b'\x01' * 60)
+        assert cache.lookup(path, size, mtime_ns + 10) is None
+        assert cache.invalidations == 1
+
+
+def test_writes_are_queued_until_commit(cache, tmp_path):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    cache.store(path, size, mtime_ns, 640, 480, '480p')
+
+    # Served from the queue, but not written yet
+    assert cache.lookup(path, size, mtime_ns) is not None
+    assert _rows(cache.db_path) == {}
+    cache.commit()
+    assert _rows(cache.db_path) == {os.path.abspath(path): (size, mtime_ns)}
+
+
+def test_entries_are_keyed_by_absolute_path(cache, tmp_path, monkeypatch):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    cache.store(path, size, mtime_ns, 640, 480, '480p')
+    cache.commit()
+
+    monkeypatch.chdir(tmp_path)
+    assert cache.lookup('a.png', size, mtime_ns) is not None
+
+
+def test_failed_write_is_dropped_with_a_warning(cache, tmp_path, caplog):
+    path = _image(tmp_path, 'a.png')
+    size, mtime_ns = _signature(path)
+    cache.store(path, size, mtime_ns, 640, 480, '480p')
+
+    # Another connection holds the write lock past the (shortened) timeout
+    cache._conn.execute('PRAGMA busy_timeout = 0')
+    blocker = sqlite3.connect(cache.db_path)
+    blocker.execute('BEGIN IMMEDIATE')
+    try:
+        cache.commit()
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    assert 'Could not write 1 classification cache entries' in caplog.text
+    assert cache.lookup(path, size, mtime_ns) is None
+    assert _rows(cache.db_path) == {}
+
+
+# --- eviction ---
+
+def test_evict_missing_removes_only_deleted_files_under_root(cache, tmp_path):
+    kept = _image(tmp_path, 'in/kept.png')
+    removed = _image(tmp_path, 'in/sub/removed.png')
+    sibling = _image(tmp_path, 'in2/gone.png')
+    for path in (kept, removed, sibling):
+        cache.store(path, *_signature(path), 640, 480, '480p')
+    cache.commit()
+    os.remove(removed)
+    os.remove(sibling)
+
+    assert cache.evict_missing(str(tmp_path / 'in')) == 1
+    # in2/ shares the in prefix as a string but is another folder
+    assert set(_rows(cache.db_path)) == {os.path.abspath(kept), os.path.abspath(sibling)}
+    assert cache.evictions == 1
+
+
+def test_evict_missing_skips_present_paths(cache, tmp_path, monkeypatch):
+    paths = [_image(tmp_path, f'in/{index}.png') for index in range(4)]
+    for path in paths:
+        cache.store(path, *_signature(path), 640, 480, '480p')
+    cache.commit()
+
+    checked = []
+    real_exists = os.path.exists
+
+    def exists(path):
+        checked.append(path)
+        return real_exists(path)
+
+    monkeypatch.setattr('cache.os.path.exists', exists)
+    present = {os.path.abspath(path) for path in paths[:3]}
+    assert cache.evict_missing(str(tmp_path / 'in'), present) == 0
+    assert checked == [os.path.abspath(paths[3])]
@@ -0,0 +1,84 @@
+"""
+Tests for the incremental-run scan watermark in tasks/manifest.py
+
+A run writes its full scan as a pending snapshot; only once its results are
+saved is the snapshot committed, minus the images that failed, so a run that
+dies midway or a failed image is picked up again by the next run.
+"""
+
+import os
+
+from manifest import ScanWatermark, changed_files, read_snapshot
+
+RUN_ID = 'scheduled__2024-01-01T00:00:00+00:00'
+
+
+def _watermark(tmp_path) -> ScanWatermark:
+    return ScanWatermark(str(tmp_path / 'state' / 'scan_watermark.json.gz'))
+
+
+def test_load_without_a_committed_watermark_is_empty(tmp_path):
+    assert _watermark(tmp_path).load() == {}
+
+
+def test_pending_snapshot_is_not_visible_until_committed(tmp_path):
+    watermark = _watermark(tmp_path)
+    snapshot = {'/in/a.jpg': (100, 1), '/in/b.jpg': (200, 2)}
+
+    pending_path = watermark.write_pending(snapshot, RUN_ID)
+    assert watermark.load() == {}
+    assert set(read_snapshot(pending_path)) == set(snapshot)
+
+    assert watermark.commit(pending_path) == 2
+    assert watermark.load() == snapshot
+    assert not os.path.exists(pending_path)
+
+
+def test_pending_path_is_file_name_safe_and_per_run(tmp_path):
+    watermark = _watermark(tmp_path)
+    pending_path = watermark.pending_path(RUN_ID)
+
+    assert os.path.dirname(pending_path) == os.path.dirname(watermark.state_path)
+    assert ':' not in os.path.basename(pending_path) and '+' not in os.path.basename(pending_path)
+    assert pending_path != watermark.pending_path('manual__2024-01-02T00:00:00+00:00')
+
+
+def test_commit_excludes_failed_images(tmp_path):
+    watermark = _watermark(tmp_path)
+    pending_path = watermark.write_pending({'/in/a.jpg': (100, 1), '/in/broken.jpg': (5, 1)}, RUN_ID)
+
+    assert watermark.commit(pending_path, exclude=['/in/broken.jpg', '/in/unknown.jpg']) == 1
+    assert watermark.load() == {'/in/a.jpg': (100, 1)}
+    # The failed image counts as changed again on the next run
+    assert changed_files({'/in/a.jpg': (100, 1), '/in/broken.jpg': (5, 1)}, watermark.load()) == {
+        '/in/broken.jpg'
+    }
+
+
+def test_commit_replaces_the_previous_watermark(tmp_path):
+    watermark = _watermark(tmp_path)
+    watermark.commit(watermark.write_pending({'/in/a.jpg': (100, 1), '/in/gone.jpg': (1, 1)}, 'run1'))
+    watermark.commit(watermark.write_pending({'/in/a.jpg': (100, 2)}, 'run2'))
+
+    assert watermark.load() == {'/in/a.jpg': (100, 2)}
+    assert sorted(os.listdir(os.path.dirname(watermark.state_path))) == ['scan_watermark.json.gz']
+
+
+def test_uncommitted_run_leaves_the_watermark_unchanged(tmp_path):
+    watermark = _watermark(tmp_path)
+    watermark.save({'/in/a.jpg': (100, 1)})
+    watermark.write_pending({'/in/a.jpg': (100, 1), '/in/new.jpg': (50, 3)}, RUN_ID)
+
+    # The run died before its load step: the new image is still to be processed
+    assert changed_files({'/in/a.jpg': (100, 1), '/in/new.jpg': (50, 3)}, watermark.load()) == {
+        '/in/new.jpg'
+    }
+
+
+def test_changed_files_detects_new_resized_and_touched_files():
+    previous = {'/in/same.jpg': (100, 1), '/in/resized.jpg': (100, 1), '/in/touched.jpg': (100, 1),
+                '/in/deleted.jpg': (100, 1)}
+    snapshot = {'/in/same.jpg': (100, 1), '/in/resized.jpg': (101, 1), '/in/touched.jpg': (100, 2),
+                '/in/new.jpg': (100, 1)}
+
+    assert changed_files(snapshot, previous) == {'/in/resized.jpg', '/in/touched.jpg', '/in/new.jpg'}
@@ -0,0 +1,97 @@
+"""
+Tests for retries of partitioned output in tasks/outputs.py
+
+Part files are named after the run, so a retried run overwrites its own parts;
+remove_stale_parts then deletes the parts an earlier attempt wrote that the
+retry did not, and must never touch other runs' files, in whatever format.
+"""
+
+import os
+
+import pytest
+
+from classify import ImageClassifier
+from outputs import PartitionedResultWriter, partition_dir, remove_stale_parts, run_token
+
+DATE = '2024-01-01'
+
+
+def _results(dimensions):
+    store = ImageClassifier().new_record_store()
+    for index, (width, height) in enumerate(dimensions):
+        store.append(f"img_{index}.png", width, height, 1000)
+    return store.to_frame()
+
+
+def _part(root, category: str, name: str) -> str:
+    relative_path = os.path.join(partition_dir(category, DATE), name)
+    path = root / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'')
+    return relative_path
+
+
+def _files(root):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), root)
+        for directory, _, names in os.walk(root) for name in names
+    )
+
+
+def test_removes_unlisted_parts_of_the_run(tmp_path):
+    kept = _part(tmp_path, '4K', 'part-00000-run1.csv')
+    _part(tmp_path, '4K', 'part-00001-run1.csv')
+    _part(tmp_path, '240p', 'part-00000-run1.csv')
+
+    assert remove_stale_parts(str(tmp_path), 'run1', [{'path': kept}]) == 2
+    assert _files(tmp_path) == [kept]
+
+
+def test_keeps_other_runs_parts(tmp_path):
+    ours = _part(tmp_path, '4K', 'part-00000-run1.csv')
+    others = [
+        _part(tmp_path, '4K', 'part-00000-run10.csv'),
+        _part(tmp_path, '4K', 'part-00000-xrun1.csv'),
+        _part(tmp_path, '720p', 'part-00000-run1.csv.bak'),
+        _part(tmp_path, '720p', 'notes-run1.csv'),
+    ]
+
+    assert remove_stale_parts(str(tmp_path), 'run1', [{'path': ours}]) == 0
+    assert _files(tmp_path) == sorted(others + [ours])
+
+
+@pytest.mark.parametrize('stale_name', [
+    'part-00000-run1.parquet', 'part-00000-run1.arrow', 'part-00000-run1.ndjson',
+    'part-00000-run1.ndjson.gz', 'part-00000-run1.ndjson.zst',
+])
+def test_removes_parts_an_earlier_attempt_wrote_in_another_format(tmp_path, stale_name):
+    kept = _part(tmp_path, '4K', 'part-00000-run1.csv')
+    _part(tmp_path, '1080p', stale_name)
+
+    assert remove_stale_parts(str(tmp_path), 'run1', [{'path': kept}]) == 1
+    assert _files(tmp_path) == [kept]
+
+
+def test_root_with_glob_characters(tmp_path):
+    root = tmp_path / 'out[1]'
+    _part(root, '4K', 'part-00000-run1.csv')
+
+    assert remove_stale_parts(str(root), 'run1', []) == 1
+    assert _files(root) == []
+
+
+def test_retry_with_fewer_categories_leaves_only_its_own_parts(tmp_path):
+    token = run_token('manual__2024-01-01T00:00:00+00:00')
+    first = _results([(3840, 2160), (640, 480), (320, 240)])
+    retry = _results([(3840, 2160), (3840, 2160)])
+
+    with PartitionedResultWriter(str(tmp_path), DATE, token, 'csv', None) as writer:
+        writer.write_batch(first)
+    assert len(writer.parts) == 3
+
+    with PartitionedResultWriter(str(tmp_path), DATE, token, 'csv', None) as writer:
+        writer.write_batch(retry)
+    assert remove_stale_parts(str(tmp_path), token, writer.parts) == 2
+
+    assert _files(tmp_path) == [part['path'] for part in writer.parts]
+    assert writer.parts[0]['category'] == '4K' and writer.parts[0]['rows'] == 2
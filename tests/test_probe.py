@@ -0,0 +1,283 @@
+"""
+Behavioural tests for the header-only dimension probes in tasks/probe.py
+
+Most fixtures are hand-built byte strings, so each test pins down exactly the
+header layout it exercises: truncated headers, JPEG fill bytes and large APP
+segments, big-endian TIFF, the three WebP chunk types and top-down BMPs.
+"""
+
+import struct
+
+import pytest
+from PIL import Image
+
+from probe import HEADER_BYTES, PNG_SIGNATURE, probe_dimensions, probe_with_budget
+
+
+def _write(tmp_path, name: str, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _jpeg(width: int, height: int, before_frame: bytes = b'', marker: int = 0xC0) -> bytes:
+    """SOI, optional segments, a start-of-frame segment for three components, EOI"""
+    frame = struct.pack('>BHHB', 8, height, width, 3) + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01'
+    sof = bytes([0xFF, marker]) + struct.pack('>H', 2 + len(frame)) + frame
+    return b'\xff\xd8' + before_frame + sof + b'\xff\xd9'
+
+
+def _app_segment(payload_bytes: int, marker: int = 0xE1) -> bytes:
+    return bytes([0xFF, marker]) + struct.pack('>H', 2 + payload_bytes) + b'\x00' * payload_bytes
+
+
+def _png(width: int, height: int) -> bytes:
+    ihdr = struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00'
+    return PNG_SIGNATURE + struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + b'\x00' * 4
+
+
+def _bmp(width: int, height: int) -> bytes:
+    """BITMAPINFOHEADER bitmap header; a negative height is a top-down bitmap"""
+    dib = struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, 0, 2835, 2835, 0, 0)
+    return b'BM' + struct.pack('<IHHI', 14 + len(dib), 0, 0, 14 + len(dib)) + dib
+
+
+def _tiff(endian: str, tags) -> bytes:
+    """TIFF header and first IFD from (tag, field type, value) entries"""
+    magic = b'II*\x00' if endian == '<' else b'MM\x00*'
+    entries = b''
+    for tag, field_type, value in tags:
+        # Values are left-justified in the 4-byte value field
+        packed = struct.pack(endian + ('H' if field_type == 3 else 'I'), value).ljust(4, b'\x00')
+        entries += struct.pack(endian + 'HHI', tag, field_type, 1) + packed
+    ifd = struct.pack(endian + 'H', len(tags)) + entries + struct.pack(endian + 'I', 0)
+    return magic + struct.pack(endian + 'I', 8) + ifd
+
+
+def _webp(chunk: bytes, payload: bytes) -> bytes:
+    payload = payload.ljust(18, b'\x00')
+    body = b'WEBP' + chunk + struct.pack('<I', len(payload)) + payload
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def _vp8(width: int, height: int, scale_bits: int = 0) -> bytes:
+    # The top two bits of each 16-bit dimension are a scaling code, not part of the size
+    dimensions = struct.pack('<HH', width | scale_bits << 14, height | scale_bits << 14)
+    return _webp(b'VP8 ', b'\x00\x00\x00' + b'\x9d\x01\x2a' + dimensions)
+
+
+def _vp8l(width: int, height: int) -> bytes:
+    bits = (width - 1) | (height - 1) << 14
+    return _webp(b'VP8L', b'\x2f' + struct.pack('<I', bits))
+
+
+def _vp8x(width: int, height: int) -> bytes:
+    canvas = (width - 1).to_bytes(3, 'little') + (height - 1).to_bytes(3, 'little')
+    return _webp(b'VP8X', b'\x10\x00\x00\x00' + canvas)
+
+
+# Truncated headers
+
+@pytest.mark.parametrize('name, data', [
+    ('jpeg_in_frame.jpg', _jpeg(640, 480)[:10]),
+    ('jpeg_in_segment.jpg', b'\xff\xd8' + _app_segment(100)[:50]),
+    ('jpeg_marker_only.jpg', b'\xff\xd8\xff'),
+    ('png_in_ihdr.png', _png(640, 480)[:20]),
+    ('bmp_in_dib.bmp', _bmp(640, 480)[:22]),
+    ('tiff_header.tiff', _tiff('<', [(256, 3, 640), (257, 3, 480)])[:6]),
+    ('tiff_in_ifd.tiff', _tiff('>', [(256, 3, 640), (257, 3, 480)])[:16]),
+    ('webp_in_vp8.webp', _vp8(640, 480)[:28]),
+])
+# PIL warns about the cut-off TIFF IFD while failing to open it
+@pytest.mark.filterwarnings('ignore:Corrupt EXIF data')
+def test_truncated_header_is_unreadable(tmp_path, name, data):
+    path = _write(tmp_path, name, data)
+
+    assert probe_dimensions(path) is None
+    # The budgeted probe falls back to PIL, which cannot identify these either
+    assert probe_with_budget(path)[0] is None
+
+
+def test_tiff_ifd_past_end_of_file(tmp_path):
+    data = b'II*\x00' + struct.pack('<I', 10 ** 6)
+    assert probe_dimensions(_write(tmp_path, 'dangling.tiff', data)) is None
+
+
+def test_tiff_missing_height_tag(tmp_path):
+    data = _tiff('<', [(256, 3, 640)])
+    assert probe_dimensions(_write(tmp_path, 'no_height.tiff', data)) is None
+
+
+def test_zero_dimensions_are_unreadable(tmp_path):
+    assert probe_dimensions(_write(tmp_path, 'zero.png', _png(0, 480))) is None
+
+
+# JPEG
+
+def test_jpeg_baseline(tmp_path):
+    assert probe_dimensions(_write(tmp_path, 'a.jpg', _jpeg(1920, 1080))) == (1920, 1080)
+
+
+def test_jpeg_progressive_frame(tmp_path):
+    data = _jpeg(800, 600, marker=0xC2)
+    assert probe_dimensions(_write(tmp_path, 'progressive.jpg', data)) == (800, 600)
+
+
+def test_jpeg_fill_bytes_before_markers(tmp_path):
+    # Any marker may be preceded by 0xFF fill bytes
+    before_frame = b'\xff\xff' + _app_segment(16, 0xE0) + b'\xff\xff\xff'
+    data = _jpeg(640, 480, before_frame)
+    assert probe_dimensions(_write(tmp_path, 'fill.jpg', data)) == (640, 480)
+
+
+def test_jpeg_skips_dht_before_frame(tmp_path):
+    # DHT (0xC4) sits inside the SOFn range but carries no dimensions
+    data = _jpeg(320, 240, _app_segment(30, 0xC4))
+    assert probe_dimensions(_write(tmp_path, 'dht.jpg', data)) == (320, 240)
+
+
+def test_jpeg_scan_before_frame_is_unreadable(tmp_path):
+    data = b'\xff\xd8' + _app_segment(10, 0xDA) + b'\xff\xd9'
+    assert probe_dimensions(_write(tmp_path, 'sos.jpg', data)) is None
+
+
+def test_jpeg_large_app_segments_past_head_block(tmp_path):
+    # EXIF and XMP push the frame header far past the head block
+    before_frame = _app_segment(60000) + _app_segment(30000)
+    path = _write(tmp_path, 'exif.jpg', _jpeg(3840, 2160, before_frame))
+
+    assert probe_dimensions(path) == (3840, 2160)
+
+
+def test_jpeg_large_app_segment_reads_only_the_needed_blocks(tmp_path):
+    # Scan data after the headers keeps every block full
+    data = _jpeg(3840, 2160, _app_segment(60000)) + b'\x00' * 4 * HEADER_BYTES
+    path = _write(tmp_path, 'exif.jpg', data)
+
+    size, bytes_read = probe_with_budget(path)
+
+    # The head block, then only the block holding the frame header
+    assert size == (3840, 2160)
+    assert bytes_read == 2 * HEADER_BYTES
+
+
+def test_budget_caps_bytes_read(tmp_path):
+    path = _write(tmp_path, 'exif.jpg', _jpeg(3840, 2160, _app_segment(60000)))
+    max_bytes = HEADER_BYTES + 100
+
+    size, bytes_read = probe_with_budget(path, max_bytes=max_bytes)
+
+    # Gives up, having read at most one byte past the budget
+    assert size is None
+    assert bytes_read == max_bytes + 1
+
+
+def test_budget_covering_the_whole_file(tmp_path):
+    data = _jpeg(640, 480)
+    path = _write(tmp_path, 'small.jpg', data)
+
+    assert probe_with_budget(path, max_bytes=len(data)) == ((640, 480), len(data))
+
+
+# PNG
+
+def test_png(tmp_path):
+    assert probe_dimensions(_write(tmp_path, 'a.png', _png(1280, 720))) == (1280, 720)
+
+
+def test_png_without_ihdr_first_is_unreadable(tmp_path):
+    data = bytearray(_png(1280, 720))
+    data[12:16] = b'IDAT'
+    assert probe_dimensions(_write(tmp_path, 'a.png', bytes(data))) is None
+
+
+# TIFF
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+@pytest.mark.parametrize('field_type', [3, 4])
+def test_tiff_short_and_long_dimensions(tmp_path, endian, field_type):
+    data = _tiff(endian, [(254, 4, 0), (256, field_type, 1920), (257, field_type, 1080)])
+    assert probe_dimensions(_write(tmp_path, 'a.tiff', data)) == (1920, 1080)
+
+
+def test_tiff_big_endian_long_beyond_16_bits(tmp_path):
+    data = _tiff('>', [(256, 4, 70000), (257, 4, 65537)])
+    assert probe_dimensions(_write(tmp_path, 'wide.tiff', data)) == (70000, 65537)
+
+
+def test_tiff_written_by_pil(tmp_path):
+    path = tmp_path / 'pil.tiff'
+    Image.new('RGB', (37, 19)).save(path, format='TIFF')
+    assert probe_dimensions(str(path)) == (37, 19)
+
+
+# WebP
+
+@pytest.mark.parametrize('data, expected', [
+    (_vp8(640, 480), (640, 480)),
+    (_vp8(16383, 1), (16383, 1)),
+    (_vp8l(1, 1), (1, 1)),
+    (_vp8l(16384, 16384), (16384, 16384)),
+    (_vp8x(1920, 1080), (1920, 1080)),
+    (_vp8x(2 ** 24, 3), (2 ** 24, 3)),
+])
+def test_webp_chunks(tmp_path, data, expected):
+    assert probe_dimensions(_write(tmp_path, 'a.webp', data)) == expected
+
+
+def test_webp_vp8_ignores_scaling_bits(tmp_path):
+    data = _vp8(640, 480, scale_bits=3)
+    assert probe_dimensions(_write(tmp_path, 'scaled.webp', data)) == (640, 480)
+
+
+def test_webp_vp8_bad_start_code_is_unreadable(tmp_path):
+    data = bytearray(_vp8(640, 480))
+    data[23:26] = b'\x00\x00\x00'
+    assert probe_dimensions(_write(tmp_path, 'bad.webp', bytes(data))) is None
+
+
+def test_webp_vp8l_bad_signature_is_unreadable(tmp_path):
+    data = bytearray(_vp8l(640, 480))
+    data[20] = 0x00
+    assert probe_dimensions(_write(tmp_path, 'bad.webp', bytes(data))) is None
+
+
+@pytest.mark.parametrize('options, mode, chunk', [
+    ({'quality': 80}, 'RGB', b'VP8 '),
+    ({'lossless': True}, 'RGB', b'VP8L'),
+    # Translucent alpha forces the extended layout
+    ({'quality': 80}, 'RGBA', b'VP8X'),
+])
+def test_webp_written_by_pil(tmp_path, options, mode, chunk):
+    path = tmp_path / 'pil.webp'
+    color = (10, 20, 30, 128) if mode == 'RGBA' else (10, 20, 30)
+    Image.new(mode, (123, 45), color).save(path, format='WEBP', **options)
+    assert path.read_bytes()[12:16] == chunk
+
+    assert probe_dimensions(str(path)) == (123, 45)
+
+
+# BMP
+
+def test_bmp_bottom_up(tmp_path):
+    assert probe_dimensions(_write(tmp_path, 'a.bmp', _bmp(800, 600))) == (800, 600)
+
+
+def test_bmp_top_down_negative_height(tmp_path):
+    assert probe_dimensions(_write(tmp_path, 'top_down.bmp', _bmp(800, -600))) == (800, 600)
+
+
+def test_bmp_core_header(tmp_path):
+    dib = struct.pack('<IHHHH', 12, 320, 240, 1, 24)
+    data = b'BM' + struct.pack('<IHHI', 26, 0, 0, 26) + dib
+    assert probe_dimensions(_write(tmp_path, 'core.bmp', data)) == (320, 240)
+
+
+def test_bmp_written_by_pil(tmp_path):
+    path = tmp_path / 'pil.bmp'
+    Image.new('RGB', (77, 33)).save(path, format='BMP')
+    assert probe_dimensions(str(path)) == (77, 33)
+
+
+def test_unknown_format_is_unreadable(tmp_path):
+    assert probe_dimensions(_write(tmp_path, 'a.gif', b'GIF89a' + b'\x00' * 40)) is None
@@ -0,0 +1,64 @@
+"""
+Tests for the vectorized rounding in tasks/records.py
+
+round_like_python must agree with Python's round() value for value, since
+aspect_ratio and file_size_mb were computed with round() per record before the
+results became columnar, and the output files must not change.
+"""
+
+import numpy as np
+import pytest
+
+from classify import ImageClassifier
+from records import BYTES_PER_MB, round_like_python
+
+
+def _assert_matches_round(values: np.ndarray, ndigits: int) -> None:
+    expected = [round(float(value), ndigits) for value in values]
+    assert round_like_python(values, ndigits).tolist() == expected
+
+
+@pytest.mark.parametrize('ndigits', [0, 1, 2, 3])
+def test_matches_round_on_random_values(ndigits):
+    values = np.random.default_rng(ndigits).uniform(0, 1000, 100000)
+    _assert_matches_round(values, ndigits)
+
+
+@pytest.mark.parametrize('ndigits', [1, 2, 3])
+def test_matches_round_on_decimal_ties(ndigits):
+    # Decimal ties are rarely exact in binary, so round() goes either way;
+    # np.round alone disagrees with it on many of these
+    values = (np.arange(0, 100000) + 0.5) / 10 ** ndigits
+    assert (np.round(values, ndigits) != [round(float(value), ndigits) for value in values]).any()
+    _assert_matches_round(values, ndigits)
+
+
+def test_matches_round_on_aspect_ratios():
+    widths, heights = np.meshgrid(np.arange(1, 400), np.arange(1, 400))
+    _assert_matches_round((widths / heights).ravel(), 2)
+
+
+def test_matches_round_on_file_sizes_in_mb():
+    sizes = np.arange(0, 20 * BYTES_PER_MB, 997, dtype=np.int64)
+    _assert_matches_round(sizes / BYTES_PER_MB, 2)
+
+
+def test_keeps_shape_and_dtype():
+    values = np.array([0.125, 2.675, 1.005, -0.5, -1.5])
+    rounded = round_like_python(values, 2)
+    assert rounded.dtype == values.dtype
+    assert rounded.shape == values.shape
+    assert round_like_python(np.empty(0), 2).size == 0
+
+
+def test_record_store_columns_use_python_rounding():
+    store = ImageClassifier().new_record_store()
+    dimensions = [(1920, 1080), (1001, 3), (333, 1000), (4096, 2731)]
+    for index, (width, height) in enumerate(dimensions):
+        store.append(f"img_{index}.png", width, height, 1234567 * (index + 1))
+
+    df = store.to_frame()
+    assert df['aspect_ratio'].tolist() == [round(w / h, 2) for w, h in dimensions]
+    assert df['file_size_mb'].tolist() == [
+        round(1234567 * (index + 1) / BYTES_PER_MB, 2) for index in range(len(dimensions))
+    ]
@@ -0,0 +1,133 @@
+"""
+Tests for image discovery in tasks/scanner.py
+
+Covers extension and glob filtering, size bounds, recursion through symlinked
+folders (each directory entered once, so symlink loops terminate) and
+unreadable subfolders, and checks that scan_images and list_images plus
+stat_image agree.
+"""
+
+import os
+
+import pytest
+
+from scanner import ImageEntry, list_images, scan_images, stat_image
+
+
+def _touch(root, name: str, size: int = 10) -> str:
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'\x00' * size)
+    return str(path)
+
+
+def _names(entries):
+    return sorted(entry.name for entry in entries)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'in'
+    _touch(root, 'a.jpg', 100)
+    _touch(root, 'B.PNG', 2000)
+    _touch(root, 'notes.txt')
+    _touch(root, 'sub/c.webp', 300)
+    _touch(root, 'sub/deeper/d.tiff', 400)
+    return root
+
+
+def test_flat_scan_matches_extensions_case_insensitively(tree):
+    entries = list(scan_images(str(tree)))
+    assert _names(entries) == ['B.PNG', 'a.jpg']
+    entry = next(entry for entry in entries if entry.name == 'a.jpg')
+    stat = os.stat(tree / 'a.jpg')
+    assert entry == ImageEntry('a.jpg', str(tree / 'a.jpg'), stat.st_size, stat.st_mtime_ns)
+
+
+def test_recursive_scan_names_are_relative_paths(tree):
+    assert _names(scan_images(str(tree), recursive=True)) == [
+        'B.PNG', 'a.jpg', os.path.join('sub', 'c.webp'), os.path.join('sub', 'deeper', 'd.tiff')
+    ]
+
+
+def test_include_and_exclude_globs_match_relative_paths(tree):
+    assert _names(scan_images(str(tree), recursive=True, include=['sub/*'])) == [
+        os.path.join('sub', 'c.webp'), os.path.join('sub', 'deeper', 'd.tiff')
+    ]
+    assert _names(scan_images(str(tree), recursive=True, exclude=['sub/deeper/*', '*.PNG'])) == [
+        'a.jpg', os.path.join('sub', 'c.webp')
+    ]
+
+
+def test_size_bounds_are_inclusive(tree):
+    assert _names(scan_images(str(tree), recursive=True, min_size=300, max_size=400)) == [
+        os.path.join('sub', 'c.webp'), os.path.join('sub', 'deeper', 'd.tiff')
+    ]
+
+
+def test_list_images_and_stat_image_agree_with_scan_images(tree):
+    listed = [stat_image(image, 200, None) for image in list_images(str(tree), recursive=True)]
+    assert sorted(entry for entry in listed if entry is not None) == \
+        sorted(scan_images(str(tree), recursive=True, min_size=200))
+
+
+def test_missing_folder_raises(tmp_path):
+    with pytest.raises(OSError):
+        list(scan_images(str(tmp_path / 'missing')))
+
+
+# --- symlinks ---
+
+def test_symlink_loop_is_entered_once(tree):
+    os.symlink('..', tree / 'sub' / 'up')
+    os.symlink('.', tree / 'sub' / 'deeper' / 'self')
+
+    names = _names(scan_images(str(tree), recursive=True))
+    assert names == [
+        'B.PNG', 'a.jpg', os.path.join('sub', 'c.webp'), os.path.join('sub', 'deeper', 'd.tiff')
+    ]
+
+
+def test_mutually_linked_folders_terminate(tmp_path):
+    root = tmp_path / 'in'
+    _touch(root, 'x/x.jpg')
+    _touch(root, 'y/y.jpg')
+    os.symlink(os.path.join('..', 'y'), root / 'x' / 'to_y')
+    os.symlink(os.path.join('..', 'x'), root / 'y' / 'to_x')
+
+    entries = list(scan_images(str(root), recursive=True))
+    assert sorted(os.path.basename(entry.path) for entry in entries) == ['x.jpg', 'y.jpg']
+
+
+def test_symlinked_folder_outside_root_is_followed(tmp_path):
+    outside = tmp_path / 'outside'
+    _touch(outside, 'o.png')
+    root = tmp_path / 'in'
+    root.mkdir()
+    os.symlink(outside, root / 'linked')
+
+    assert _names(scan_images(str(root), recursive=True)) == [os.path.join('linked', 'o.png')]
+    assert _names(scan_images(str(root))) == []
+
+
+def test_broken_symlinks_are_skipped(tmp_path):
+    root = tmp_path / 'in'
+    _touch(root, 'ok.jpg')
+    os.symlink(tmp_path / 'nowhere.jpg', root / 'dangling.jpg')
+    os.symlink(tmp_path / 'nowhere', root / 'dangling_dir')
+
+    assert _names(scan_images(str(root), recursive=True)) == ['ok.jpg']
+
+
+@pytest.mark.skipif(os.name != 'posix' or os.geteuid() == 0,
+                    reason="needs POSIX permissions that apply to the current user")
+def test_unreadable_subfolder_is_skipped_with_a_warning(tree, caplog):
+    locked = tree / 'sub' / 'deeper'
+    locked.chmod(0)
+    try:
+        names = _names(scan_images(str(tree), recursive=True))
+    finally:
+        locked.chmod(0o755)
+
+    assert names == ['B.PNG', 'a.jpg', os.path.join('sub', 'c.webp')]
+    assert 'Skipping folder' in caplog.text
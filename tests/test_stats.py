@@ -0,0 +1,97 @@
+"""
+Equivalence tests for the mergeable statistics in tasks/stats.py
+
+The load step never sees a whole run's records: every mapped task folds its
+results into a RunningStatistics, ships it as to_state() through XCom and the
+states are merged. Whatever the split, the merged statistics must equal
+ImageClassifier.generate_statistics over the concatenated results.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from classify import ImageClassifier
+from stats import RunningStatistics
+
+
+def _results(count: int, seed: int = 0) -> pd.DataFrame:
+    """Classified results for random dimensions and sizes, spanning every category"""
+    rng = np.random.default_rng(seed)
+    store = ImageClassifier().new_record_store()
+    widths = rng.integers(16, 5000, count)
+    heights = rng.integers(16, 3000, count)
+    sizes = rng.integers(1, 50 * 1024 * 1024, count)
+    for index, (width, height, size) in enumerate(zip(widths, heights, sizes)):
+        store.append(f"img_{index:05d}.jpg", int(width), int(height), int(size))
+    return store.to_frame()
+
+
+def _roundtrip(stats: RunningStatistics) -> RunningStatistics:
+    # Through JSON, as the state travels through XCom
+    return RunningStatistics.from_state(json.loads(json.dumps(stats.to_state())))
+
+
+@pytest.mark.parametrize('count, chunk_rows', [(100, 1), (1000, 7), (1000, 250), (1000, 1000)])
+def test_merged_chunk_states_match_generate_statistics(count, chunk_rows):
+    df = _results(count)
+    merged = RunningStatistics()
+    for start in range(0, len(df), chunk_rows):
+        chunk = RunningStatistics()
+        chunk.update_frame(df.iloc[start:start + chunk_rows])
+        merged.merge(_roundtrip(chunk))
+
+    assert merged.to_dict() == ImageClassifier().generate_statistics(df)
+
+
+def test_per_record_updates_match_update_frame():
+    df = _results(300, seed=1)
+    by_record = RunningStatistics()
+    for record in df.to_dict('records'):
+        by_record.update(record)
+    by_frame = RunningStatistics()
+    by_frame.update_frame(df)
+
+    assert by_record.to_dict() == by_frame.to_dict()
+    assert by_record.category_bytes == by_frame.category_bytes
+
+
+def test_empty_states_merge_as_identity():
+    df = _results(50, seed=2)
+    stats = RunningStatistics()
+    stats.update_frame(df)
+    expected = stats.to_dict()
+
+    stats.merge(_roundtrip(RunningStatistics()))
+    stats.update_frame(df.iloc[:0])
+    assert stats.to_dict() == expected
+    assert _roundtrip(RunningStatistics()).to_dict() == {}
+
+
+def test_quantile_histograms_survive_state_roundtrip_and_merge():
+    df = _results(400, seed=3)
+    whole = RunningStatistics(quantiles=True)
+    whole.update_frame(df)
+
+    merged = RunningStatistics(quantiles=True)
+    for start in range(0, len(df), 64):
+        chunk = RunningStatistics(quantiles=True)
+        chunk.update_frame(df.iloc[start:start + 64])
+        merged.merge(_roundtrip(chunk))
+
+    assert merged.histograms == whole.histograms
+    assert merged.to_dict() == whole.to_dict()
+    assert set(merged.to_dict()['quantiles']) == {'file_size_mb', 'total_pixels'}
+
+
+def test_quantile_is_within_bucket_error():
+    stats = RunningStatistics(quantiles=True)
+    for size in range(1, 10001):
+        stats.update({'width': 1, 'height': 1, 'resolution_category': '240p',
+                      'file_size_bytes': size, 'file_size_mb': 0.0, 'aspect_ratio': 1.0,
+                      'total_pixels': size})
+
+    median = stats.quantile('file_size_bytes', 0.5)
+    assert abs(median - 5000) / 5000 < 0.05